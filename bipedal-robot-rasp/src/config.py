@@ -96,4 +96,12 @@ CAM_PITCH = 60
 ## 直线的类型
 ## 1: 单轨 3: 三轨
 #############################
-LINE_TYPE = 1
\ No newline at end of file
+LINE_TYPE = 1
+#############################
+## 画面预览
+## 在独立的进程中显示, 不影响图像处理的帧率
+#############################
+# 画面预览的最大帧率
+DISPLAY_FPS = 15
+# 画面录制的保存目录, 为None时不录制
+DISPLAY_RECORD_DIR = None
@@ -17,6 +17,67 @@ import logging
 import gc
 from config import LINE_TYPE
 
+class OtsuTracker:
+    '''跨帧的Otsu阈值估计
+    维护一个按帧衰减的灰度直方图, 每一帧只统计当前帧的直方图并累加到历史直方图上,
+    Otsu阈值由累计直方图计算(每一帧只计算一次), 并经过一阶低通滤波平滑, 避免阈值在相邻帧之间跳变
+    当前帧的平均灰度与累计直方图的平均灰度相差过大时(例如光照突变, 场景切换), 清空历史状态重新估计
+    '''
+    def __init__(self, decay=0.7, alpha=0.3, max_jump=40):
+        '''
+        decay: 历史直方图的衰减系数, 为0时只使用当前帧
+        alpha: 阈值的平滑系数, 为1时不平滑
+        max_jump: 当前帧与累计直方图的平均灰度的最大差值(灰度值), 超出时清空历史状态
+        '''
+        self.decay = decay
+        self.alpha = alpha
+        self.max_jump = max_jump
+        self.bins = np.arange(256, dtype=np.float64)
+        # 累积分布与累积一阶矩的缓存, 每一帧重复使用
+        self.omega = np.zeros(256)
+        self.mu = np.zeros(256)
+        self.reset()
+
+    def reset(self):
+        '''清空历史状态'''
+        self.hist = None # 累计的灰度直方图(归一化)
+        self.mean = None # 累计直方图的平均灰度
+        self.threshold = None # 平滑之后的阈值
+
+    def otsu(self, hist):
+        '''根据直方图计算Otsu阈值(类间方差最大), 划分方式与cv2.THRESH_OTSU一致(小于等于阈值为一类)
+        返回值: 阈值, 直方图的平均灰度
+        '''
+        omega = np.cumsum(hist, out=self.omega) # 第一类的概率
+        mu = np.cumsum(np.multiply(hist, self.bins, out=self.mu), out=self.mu) # 第一类的一阶矩
+        mu_t = mu[-1]
+        # 类间方差 (mu_t*omega - mu)^2 / (omega*(1-omega))
+        # omega为0或1时分子同样为0, 分母取一个极小值即可, 不需要单独处理除零
+        sigma_b = np.subtract(mu_t * omega, mu)
+        sigma_b *= sigma_b
+        sigma_b /= np.maximum(omega * (1 - omega), 1e-12)
+        return float(np.argmax(sigma_b)), mu_t
+
+    def update(self, gray):
+        '''输入当前帧的灰度图, 返回平滑之后的阈值'''
+        hist = np.bincount(gray.ravel(), minlength=256) * (1.0 / gray.size)
+        if self.mean is not None and abs(np.dot(hist, self.bins) - self.mean) > self.max_jump:
+            # 平均灰度突变, 历史状态已经不能反映当前的场景
+            self.reset()
+        if self.hist is None:
+            self.hist = hist
+        else:
+            # 历史衰减 + 当前帧
+            self.hist *= self.decay
+            hist *= 1 - self.decay
+            self.hist += hist
+        threshold, self.mean = self.otsu(self.hist)
+        if self.threshold is None:
+            self.threshold = threshold
+        else:
+            self.threshold += self.alpha * (threshold - self.threshold)
+        return self.threshold
+
 class TrackFit:
     '''赛道曲线拟合'''
     # 图像缩放因子
@@ -29,6 +90,19 @@ class TrackFit:
     # TRACK_HSV_UPPERB = (120, 26, 255) # 阈值上界
     TRACK_HSV_LOWERB = (0, 0, 0)
     TRACK_HSV_UPPERB = (255, 255, 255)
+    # 预处理的融合模式
+    # 赛道阈值通过BGR查找表直接在缩放图像上完成(不再转换HSV),
+    # 灰度图由缩放之后的彩图转换得到(不再对原图做灰度转换与高斯滤波)
+    FUSED_PREPROCESS = True
+    # 融合模式下, 缩放之后的灰度图的高斯滤波标准差, 为0时不滤波
+    # 注: 原图5x5高斯滤波之后再缩放为1/20, 等效于缩放图像上几乎不滤波,
+    # 直接转换的灰度图与原来的结果最接近
+    SMALL_BLUR_SIGMA = 0
+    # 跨帧平滑的Otsu阈值(见OtsuTracker), 为False时每一帧单独计算Otsu阈值
+    OTSU_TRACKING = True
+    OTSU_HIST_DECAY = 0.7 # 历史直方图的衰减系数
+    OTSU_THRESH_ALPHA = 0.3 # 阈值的平滑系数
+    OTSU_MAX_JUMP = 40 # 平均灰度突变的判断条件(灰度值), 超出时清空历史状态
     # 色块的最小连通区域面积(针对32x24的缩略图)
     MIN_CNT_AREA = 10 # 25 # 最小的连通区域的面积(针对缩放之后的图像)
     # 机器人坐标系下点的取值范围
@@ -78,6 +152,14 @@ class TrackFit:
         self.set_painter()
         self.pt_near2org = (self.RB_X_MIN, 0)
         self.last_y_offset = 0
+        # 跨帧的Otsu阈值估计
+        self.otsu_tracker = OtsuTracker(decay=self.OTSU_HIST_DECAY, alpha=self.OTSU_THRESH_ALPHA, \
+            max_jump=self.OTSU_MAX_JUMP)
+        # BGR->赛道类别的查找表
+        self.track_lut = None
+        if self.FUSED_PREPROCESS and not self.is_track_all_pass():
+            # 生成查找表需要一定的时间, 在初始化的时候完成, 不影响第一帧的处理
+            self.get_track_lut()
 
     def set_painter(self):
         if self.PAINTER == 'MATPLOTLIB':
@@ -98,27 +180,66 @@ class TrackFit:
             img, contours, hierarchy =  cv2.findContours(img_bin, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         return contours
 
+    def is_track_all_pass(self):
+        '''赛道的HSV阈值是否覆盖全部颜色(此时赛道的二值化图像全部为255, 不需要查找表)
+        注: OpenCV中8位图像的H通道取值范围为0-179
+        '''
+        return tuple(self.TRACK_HSV_LOWERB) == (0, 0, 0) and \
+            np.all(np.array(self.TRACK_HSV_UPPERB) >= (179, 255, 255))
+
+    def get_track_lut(self):
+        '''获取BGR->赛道类别的查找表
+        尺寸为256x256x256, 按照[B, G, R]索引, 赛道颜色(HSV阈值范围内)为255, 其余为0
+        每次只转换一个B通道取值对应的65536种颜色, 避免占用过多的内存
+        '''
+        if self.track_lut is None:
+            self.track_lut = np.empty((256, 256, 256), dtype=np.uint8)
+            bgr_plane = np.empty((256, 256, 3), dtype=np.uint8)
+            bgr_plane[:, :, 1] = np.arange(256, dtype=np.uint8)[:, None]
+            bgr_plane[:, :, 2] = np.arange(256, dtype=np.uint8)[None, :]
+            for b in range(256):
+                bgr_plane[:, :, 0] = b
+                hsv_plane = cv2.cvtColor(bgr_plane, cv2.COLOR_BGR2HSV)
+                cv2.inRange(hsv_plane, lowerb=self.TRACK_HSV_LOWERB, upperb=self.TRACK_HSV_UPPERB, \
+                    dst=self.track_lut[b])
+        return self.track_lut
+
     def img_preprocess(self, img):
         '''图像预处理'''
         # 将彩图缩放为小图
         img_small_bgr = cv2.resize(img, dsize=None, fx=self.IMG_SCALE_FACTOR, fy=self.IMG_SCALE_FACTOR)
-        # 转换为HSV色彩空间
-        img_small_hsv = cv2.cvtColor(img_small_bgr, cv2.COLOR_BGR2HSV)
-        # 对彩色缩放图进行二值化,过滤掉除了黑色跟白色之外的其他颜色的背景
-        bin_track = cv2.inRange(img_small_hsv, lowerb=self.TRACK_HSV_LOWERB, upperb=self.TRACK_HSV_UPPERB)
+        if self.FUSED_PREPROCESS and self.is_track_all_pass():
+            # 阈值覆盖全部颜色, 跳过查找表(与HSV阈值的结果一致)
+            bin_track = np.full(img_small_bgr.shape[:2], 255, dtype=np.uint8)
+        elif self.FUSED_PREPROCESS:
+            # 通过查找表完成赛道的二值化, 与HSV阈值的结果一致
+            track_lut = self.get_track_lut()
+            bin_track = track_lut[img_small_bgr[:, :, 0], img_small_bgr[:, :, 1], img_small_bgr[:, :, 2]]
+        else:
+            # 转换为HSV色彩空间
+            img_small_hsv = cv2.cvtColor(img_small_bgr, cv2.COLOR_BGR2HSV)
+            # 对彩色缩放图进行二值化,过滤掉除了黑色跟白色之外的其他颜色的背景
+            bin_track = cv2.inRange(img_small_hsv, lowerb=self.TRACK_HSV_LOWERB, upperb=self.TRACK_HSV_UPPERB)
         # 对二值化图像进行闭运算
         # bin_track = cv2.morphologyEx(bin_track, cv2.MORPH_CLOSE,\
         #    np.ones((3,3), np.uint8),iterations=1)
         # 对二值化图像进行膨胀
         bin_track = cv2.dilate(bin_track, np.ones((3,3), np.uint8), iterations=1)
 
-        # 彩图转换为灰度图
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        if self.FUSED_PREPROCESS:
+            # 缩放之后的彩图转换为灰度图
+            gray_small = cv2.cvtColor(img_small_bgr, cv2.COLOR_BGR2GRAY)
+            if self.SMALL_BLUR_SIGMA > 0:
+                # 在缩放图像上进行高斯滤波
+                gray_small = cv2.GaussianBlur(gray_small, (3, 3), sigmaX=self.SMALL_BLUR_SIGMA)
+        else:
+            # 彩图转换为灰度图
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-        # 高斯滤波,过滤掉广告布本身的纹理细节,以及局部的小亮点(反光点)
-        gray = cv2.GaussianBlur(gray, (5, 5), sigmaX=1)
-        # 将灰度图进行缩放
-        gray_small = cv2.resize(gray, dsize=None, fx=self.IMG_SCALE_FACTOR , fy=self.IMG_SCALE_FACTOR)
+            # 高斯滤波,过滤掉广告布本身的纹理细节,以及局部的小亮点(反光点)
+            gray = cv2.GaussianBlur(gray, (5, 5), sigmaX=1)
+            # 将灰度图进行缩放
+            gray_small = cv2.resize(gray, dsize=None, fx=self.IMG_SCALE_FACTOR , fy=self.IMG_SCALE_FACTOR)
         
         # 通过像素统计判断是否存在直线
         blk_pt_n = np.sum(gray_small < self.LINE_GRAY_MAX)
@@ -127,6 +248,8 @@ class TrackFit:
             bin_track = np.uint8(np.uint8(gray_small > self.LINE_GRAY_MAX) * 255)
             bin_ostu = cv2.bitwise_not(bin_track)
             bin_line = bin_ostu
+            # 画面中没有直线, 历史直方图不再可信(例如离开赛道), 下次重新估计阈值
+            self.otsu_tracker.reset()
             return False, gray_small, bin_track, bin_ostu, bin_line
 
         # 限制gray中的最大值
@@ -136,7 +259,12 @@ class TrackFit:
         gray_small[gray_small > self.TRACK_GRAY_MAX] = self.TRACK_GRAY_MAX
         
         # 对缩小的图进行自适应阈值
-        ret, bin_ostu = cv2.threshold(gray_small, 0, 255, cv2.THRESH_BINARY_INV+cv2.THRESH_OTSU)
+        if self.OTSU_TRACKING:
+            # 使用跨帧平滑之后的阈值
+            otsu_thresh = self.otsu_tracker.update(gray_small)
+            ret, bin_ostu = cv2.threshold(gray_small, otsu_thresh, 255, cv2.THRESH_BINARY_INV)
+        else:
+            ret, bin_ostu = cv2.threshold(gray_small, 0, 255, cv2.THRESH_BINARY_INV+cv2.THRESH_OTSU)
         # print('OSTU Binary Ret: {}'.format(ret))
         # 对二值化图像进行闭运算
         # bin_ostu = cv2.morphologyEx(bin_ostu, cv2.MORPH_CLOSE,\
@@ -160,6 +288,9 @@ class TrackFit:
         
         # 判断画面中是否有直线的区域
         has_line = valid_cnt_num >= 1
+        if not has_line:
+            # 没有找到合法的直线, 平滑之后的阈值可能已经偏离, 下次重新估计阈值
+            self.otsu_tracker.reset()
         
         return has_line, gray_small, bin_track, bin_ostu, bin_line
     
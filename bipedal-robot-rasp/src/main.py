@@ -19,6 +19,7 @@ from dbsp import ServoAngleControlEvent
 from dbsp_action_group import *
 from cv_camera import Camera
 from cv_track_fit import TrackFit
+from cv_display import DisplayProcess
 from config import *
 
 # 设置日志输出等级
@@ -28,12 +29,9 @@ def worker_cv_line(robo_init_evt, cam_data_load_evt, action_done_evt, \
         has_line_info_evt, line_info_dict, game_interrupt_evt):
     '''子进程-图像处理'''
     
-    # 图像预处理窗口
-    cv2.namedWindow('img_preprocess',flags=cv2.WINDOW_NORMAL | cv2.WINDOW_KEEPRATIO | cv2.WINDOW_GUI_EXPANDED)
-    # 带标记的彩图
-    cv2.namedWindow('img_raw',flags=cv2.WINDOW_NORMAL | cv2.WINDOW_KEEPRATIO | cv2.WINDOW_GUI_EXPANDED)
-    # 机器人坐标系下点图+拟合曲线图
-    cv2.namedWindow('canvas_robo',flags=cv2.WINDOW_NORMAL | cv2.WINDOW_KEEPRATIO | cv2.WINDOW_GUI_EXPANDED)
+    # 画面预览进程(窗口的刷新不会阻塞图像处理)
+    # 窗口: img_preprocess 图像预处理, img_raw 带标记的彩图, canvas_robo 机器人坐标系下点图+拟合曲线图
+    display = DisplayProcess(fps=DISPLAY_FPS, record_dir=DISPLAY_RECORD_DIR).start()
 
     # 初始化相机
     cam = Camera(device=CAM_PORT_NAME)
@@ -51,10 +49,9 @@ def worker_cv_line(robo_init_evt, cam_data_load_evt, action_done_evt, \
     while not robo_init_evt.is_set():
         # 单纯刷新图像
         ret, frame = capture.read()
-        cv2.imshow('img_raw', frame)
-        # 更新显示的图像
-        key = cv2.waitKey(1)
-        if key == ord('q'):
+        if ret:
+            display.publish({'img_raw': frame})
+        if display.get_key() == ord('q'):
             break
     
     # 创建赛道曲线拟合的对象
@@ -76,9 +73,7 @@ def worker_cv_line(robo_init_evt, cam_data_load_evt, action_done_evt, \
         # img = cam.remove_distortion(img)
         if not action_done_evt.is_set():
             # 动作进行中, 不进行图像处理
-            # 更新窗口“image_win”中的图片
-            key = cv2.waitKey(1)
-            if key == ord('q'):
+            if display.get_key() == ord('q'):
                 # 如果按键为q 代表quit 退出程序
                 break
             continue
@@ -128,19 +123,16 @@ def worker_cv_line(robo_init_evt, cam_data_load_evt, action_done_evt, \
             org=(cw-30, 25), fontFace=cv2.FONT_HERSHEY_SIMPLEX, \
             fontScale=0.5, thickness=1, lineType=cv2.LINE_AA, color=(0, 0, 255))
         
-        # 更新窗口“image_win”中的图片
-        cv2.imshow('img_raw', canvas_img) # 显示原始图像(上面附带标记点)
-        cv2.imshow('img_preprocess', canvas) # 显示图像预处理之后的图像
-        cv2.imshow('canvas_robo', canvas_robo)
-        key = cv2.waitKey(1)
-        if key == ord('q'):
+        # 发布画面到预览进程
+        display.publish({'img_raw': canvas_img, 'img_preprocess': canvas, 'canvas_robo': canvas_robo})
+        if display.get_key() == ord('q'):
             # 如果按键为q 代表quit 退出程序
             break
 
     # 关闭摄像头
     capture.release()
-    # 销毁所有的窗口
-    cv2.destroyAllWindows()
+    # 关闭画面预览进程
+    display.stop()
     # 设置游戏中断
     game_interrupt_evt.set()
     time.sleep(5)
@@ -56,6 +56,10 @@ MARCO_GO_RIGHT_INTERVAL = 480
 RELEX_AFTER_GAME_OVER = True # 游戏结束的时候, 是否卸力
 YAW_CTL_DEADAREA = 10.0 # 偏航角控制的死区,单位°
 GO_FORWARD_DIS_PER_STEP = 6.6 # 机器人前进一步的距离, 单位cm
+# 各个动作组沿机器人前进方向的位移(单位cm), 用于巡线跟踪模式的里程累计
+# 前进左偏/右偏主要改变朝向(robot_turn也用它们原地修正偏航角), 朝向的变化由IMU偏航角提供,
+# 前进方向的位移没有实测, 按0处理(跟踪模式的带状区域与残差检查可以容忍这部分误差)
+ACTION_FORWARD_DIS = {'GO_FORWARD': GO_FORWARD_DIS_PER_STEP, 'GO_LEFT': 0.0, 'GO_RIGHT': 0.0}
 
 #############################
 ## IMU位姿融合
@@ -97,6 +101,19 @@ CAM_EXPOSURE_AUTO = True
 CAM_EXPOSURE_ABSOLUTE = 78
 # 相机帧率
 CAM_FPS = 30
+# 相机参数的下发方式
+# 'v4l2-ctl': 通过v4l2-ctl设置参数 'dry-run': 只记录命令不执行(调试用)
+CAM_CTL_BACKEND = 'v4l2-ctl'
+# 是否按需缩小比例解码MJPEG
+# 巡线跟交通锥识别只需要小图, 利用libjpeg的DCT缩放直接解码出1/2,1/4,1/8的图像
+# 注: 仅在串行模式(CV_PARALLEL=False)下生效
+# 注: 默认关闭. DCT缩放解码相当于块内求均值, 与全分辨率解码之后再缩放的像素值不同,
+#     而巡线的阈值(LINE_GRAY_MAX, MIN_CC_AREA等)是在全分辨率解码的流程上调整的,
+#     二值化结果与偏航角存在差异(见 cv_benchmark.py --bench=decode), 重新调整阈值之后再开启
+CAM_DECODE_REDUCED = False
+# 相机标定数据包(内存映射格式)的存放目录
+# 通过 update_calib_bundle.py 从旧版的pickle文件转换生成
+CAM_CALIB_BUNDLE = 'config/calib_bundle'
 
 #############################
 ## 相机安装位置相关机械参数
@@ -123,10 +140,28 @@ GAME_STATE_GAME_END = 4 # 游戏结束
 
 ROBO_PAUSE = True # 机器人暂停运动(未启用)
 
+## 图像处理的并行模式
+# True: 采集进程通过共享内存发布图像, 巡线/交通锥/ArucoTag分别在独立的进程中并行处理
+# False: 图像采集与所有的图像处理在同一个进程中串行执行
+CV_PARALLEL = False
+CV_FRAME_RING_NAME = 'fs_cv_frame_ring' # 共享内存的名称
+CV_FRAME_RING_SLOT = 4 # 环形缓冲区的槽位个数
+# 巡线跟踪模式
+# 根据上一帧的曲线与机器人的运动(前进距离+IMU偏航角)预测曲线的位置, 只在预测曲线附近搜索
+# 偏航角逆时针为正(与robot_turn一致), 预测失败(带状区域内点过少/残差过大)时退回全局搜索
+# 合成赛道上的验证见 cv_benchmark.py --bench=track_temporal
+CV_TRACK_TEMPORAL = True
+# 图像处理各个阶段(采集/预处理/透视逆变换/拟合/交通锥/ArucoTag/显示)的耗时统计
+CV_TIMING_FRAMES = 1024 # 保存最近多少帧的耗时
+CV_TIMING_LOG_INTERVAL = 0 # 每隔多少帧输出一次P50/P95/P99, 为0时只在退出时输出
+CV_TIMING_TRACE_DIR = None # 退出时导出Chrome Trace(JSON)的目录, 为None时不导出
+
 ## 巡线
 DISPLAY_IMAGE = True # 是否预览原始图像
 DISPLAY_BIN_CONE = False # 是否展示交通锥的二值化图像
 DISPLAY_BIN_LINE = False # 是否展示曲线的二值化图像
+DISPLAY_FPS = 15 # 画面预览的最大帧率(在独立的进程中显示, 不影响图像处理的帧率)
+DISPLAY_RECORD_DIR = None # 画面录制的保存目录, 为None时不录制
 LINE_TYPE = 1 ## 直线的类型 (1: 单轨 3: 三轨)
 # 图像阈值BGR
 # 注意!颜色空间是BGR哦, 不是RGB
@@ -4,10 +4,15 @@ import cv2
 from cv2 import aruco
 
 from cv_camera import Camera
+from cv_frame_pyramid import FramePyramid
 from geometry import Geometry
 from config import *
 
 class ArucoDetect:
+    # 检测区域(ROI)相对ArucoTag外接矩形的外扩比例
+    ROI_MARGIN = 0.5
+    # 检测区域的最小外扩像素(原图尺寸)
+    ROI_MARGIN_MIN = 40
     def __init__(self, cam):
         self.cam = cam
         # 选择ArucoTag的字典
@@ -18,39 +23,82 @@ class ArucoDetect:
         self.marker_size = ARUCO_SIZE
         # 有效的ArucoID
         # self.known_arucos = [LEFT_ARUCO_ID, RIGHT_ARUCO_ID]
+        # 上一帧ArucoTag附近的检测区域 (缩放比例, (x, y, w, h)), 为None时检测整幅图像
+        self.last_roi = None
 
-    def find_aruco(self, img, canvas=None):
-        # 创建画布
-        if canvas is None:
-            canvas = np.copy(img)
-        # 转换为灰度图
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        # 图像去除畸变
-        gray = self.cam.remove_distortion(gray)
-        # 检测画面中的ArucoTag
+    def update_roi(self, corners, img_size, img_scale):
+        '''根据当前帧检测到的ArucoTag角点, 更新下一帧的检测区域'''
+        pts = np.concatenate([c.reshape(-1, 2) for c in corners])
+        x_min, y_min = pts.min(axis=0)
+        x_max, y_max = pts.max(axis=0)
+        margin = max(self.ROI_MARGIN * max(x_max - x_min, y_max - y_min), self.ROI_MARGIN_MIN * img_scale)
+        w, h = img_size
+        x1 = max(int(x_min - margin), 0)
+        y1 = max(int(y_min - margin), 0)
+        x2 = min(int(x_max + margin) + 1, w)
+        y2 = min(int(y_max + margin) + 1, h)
+        self.last_roi = (img_scale, (x1, y1, x2 - x1, y2 - y1))
+
+    def detect_markers(self, gray, img_scale, roi=None):
+        '''去除畸变并检测ArucoTag
+        roi: 只在去畸变之后图像的局部区域(x, y, w, h)中检测, 角点坐标会换算回整幅图像
+        '''
+        gray = self.cam.remove_distortion(gray, scale=img_scale, roi=roi)
         corners, aruco_ids, rejected_img_pts = aruco.detectMarkers(gray, \
             self.aruco_dict, parameters=self.aruco_params)
+        if aruco_ids is not None and roi is not None:
+            offset = np.float32(roi[:2])
+            corners = tuple(c + offset for c in corners)
+        return corners, aruco_ids
+
+    def find_aruco(self, img, canvas=None, img_scale=1.0, is_draw=True):
+        '''检测ArucoTag
+        img: 输入图像, 也可以是多个检测器共享的图像金字塔FramePyramid
+        img_scale: 输入图像相对原图的缩放比例, 相机内参与去畸变映射也会同步缩放
+        is_draw: 是否在画布上绘制检测结果, 为False时不创建画布, 返回的canvas为None
+        '''
+        frame = img if isinstance(img, FramePyramid) else FramePyramid(img, img_scale)
+        # 在金字塔底层(分辨率最高)的图像上检测
+        img_scale = frame.base_scale
+        # 创建画布
+        if canvas is None and is_draw:
+            canvas = np.copy(frame.base)
+        # 缩放之后的相机内参
+        intrinsic = self.cam.intrinsic if img_scale == 1.0 else self.cam.scaled_intrinsic(img_scale)
+        # 转换为灰度图
+        gray = frame.gray(img_scale)
+        # 优先在上一帧ArucoTag的附近检测, 只对这一区域去除畸变
+        aruco_ids = None
+        if self.last_roi is not None and self.last_roi[0] == img_scale:
+            corners, aruco_ids = self.detect_markers(gray, img_scale, roi=self.last_roi[1])
+        if aruco_ids is None:
+            # 检测整幅图像
+            corners, aruco_ids = self.detect_markers(gray, img_scale)
 
         if aruco_ids is None:
             # 画面中没有检测到ArucoTag
+            self.last_roi = None
             return False, canvas, None, None
+        # 更新下一帧的检测区域
+        self.update_roi(corners, gray.shape[1::-1], img_scale)
 
         # 获取画面中的ArucoID  
         aruco_id = aruco_ids[0]
         # 获取旋转矩阵跟平移矩阵
         rvect, tvect, object_points = aruco.estimatePoseSingleMarkers(corners, self.marker_size, \
-            self.cam.intrinsic, self.cam.distortion)
+            intrinsic, self.cam.distortion)
         # Aruco在相机坐标系下的坐标(单位 cm)
         t_cam2aruco = np.array(tvect[0,0,:]).reshape((-1, 1))
         # 计算摄像头跟ArucoTag的直线距离
         dis_cam2aruco = np.linalg.norm(t_cam2aruco)
         
         # 可视化
-        # 绘制Marker的边框与绘制编号
-        canvas = aruco.drawDetectedMarkers(canvas, corners, aruco_ids,  (0,255,0))
-        # 绘制坐标系
-        canvas = aruco.drawAxis(canvas, self.cam.intrinsic, \
-            self.cam.distortion, rvect[0], tvect[0], 4)
+        if is_draw:
+            # 绘制Marker的边框与绘制编号
+            canvas = aruco.drawDetectedMarkers(canvas, corners, aruco_ids,  (0,255,0))
+            # 绘制坐标系
+            canvas = aruco.drawAxis(canvas, intrinsic, \
+                self.cam.distortion, rvect[0], tvect[0], 4)
 
 
         return True, canvas, aruco_id, dis_cam2aruco
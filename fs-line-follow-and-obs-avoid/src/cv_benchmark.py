@@ -0,0 +1,880 @@
+'''
+图像处理模块的性能测试
+用法示例:
+    python3 cv_benchmark.py --bench=ipm_remap
+    python3 cv_benchmark.py --bench=remap --img_path=data/image_raw
+    python3 cv_benchmark.py --bench=c1_sample --repeat=5
+    python3 cv_benchmark.py --bench=c2_sample --repeat=5
+    python3 cv_benchmark.py --bench=quad_fit
+    python3 cv_benchmark.py --bench=headless
+    python3 cv_benchmark.py --bench=draw --draw_budget=25
+    python3 cv_benchmark.py --bench=cc_filter --n_random=200
+    python3 cv_benchmark.py --bench=alloc --alloc_budget=48
+    python3 cv_benchmark.py --bench=refine --n_random=100
+    python3 cv_benchmark.py --bench=track_temporal --n_random=60
+    python3 cv_benchmark.py --bench=v4l2_ctl
+    python3 cv_benchmark.py --bench=decode
+'''
+import glob
+import math
+import time
+import tracemalloc
+import logging
+import cv2
+import numpy as np
+from cv_camera import Camera, V4L2Control
+from cv_track_fit import TrackFit, PointIndex, QuadFit
+from cv_traffic_cone import TrafficConeDetect
+from cv_frame_pyramid import FramePyramid
+from config import *
+
+def calc_ipm_remap_loop(cam):
+    '''逐像素计算IPM映射矩阵(原始实现, 作为性能对比的基准)'''
+    ipm_remap_x = np.zeros((cam.IMG_HEIGHT, cam.IMG_WIDTH))
+    ipm_remap_y = np.zeros((cam.IMG_HEIGHT, cam.IMG_WIDTH))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for px in range(cam.IMG_WIDTH):
+            for py in range(cam.IMG_HEIGHT):
+                ipm_remap_x[py][px], ipm_remap_y[py][px] = cam.inverse_projection_mapping(px, py)
+    return ipm_remap_x, ipm_remap_y
+
+def c1_pt_sample_legacy(tk, rb_x, rb_y):
+    '''曲线1滑动窗口采样(原始实现, 每一步遍历全部的点, 作为回归测试的基准)'''
+    # 对x轴的数值进行筛选
+    rb_x_unique = np.array(list(set(rb_x)))
+    # 从小到大进行排序
+    rb_x_unique = np.sort(rb_x_unique)
+    # print('rb_x_unique: {}'.format(rb_x_unique))
+    # 采样框的记录
+    # sld_win: sliding window
+    sld_win_hist = []
+    # 记录样本点是否被采样过
+    is_pt_visited = np.zeros_like(rb_x, dtype=bool)
+    # 曲线的采样点的集合
+    curve_x = []
+    curve_y = []
+    # 确定采样点的起始位置
+    root_x = rb_x_unique[0] # 找到x的最小值
+    root_y = np.mean(rb_y[np.abs(rb_x-root_x) < 1]) # 对root_x上的点的y轴求平均值
+
+    # 曲线点集中添加(root_x, root_y)
+    curve_x.append(root_x)
+    curve_y.append(root_y)
+    # 曲线的长度
+    curve_len = 0
+
+    # 添加滑动窗口日志
+    sld_win_hist.append((root_x, root_y))
+    # 惯性力(斜率)
+    k = 0
+    # 赋值上一次的点坐标
+    last_x, last_y = root_x, root_y
+    cur_x, cur_y = None, None
+    # 遍历后续的x坐标
+    for x_idx in range(1, len(rb_x_unique)):
+        cur_x = rb_x_unique[x_idx]
+        dx = cur_x - last_x
+        if dx > tk.WIN_MAX_GAP:
+            # 间隔过大,停止采样
+            # logging.info('间隔过大 last_x: {} cur_x: {} dx:{}'.format(last_x, cur_x, dx))
+            break
+        # 根据斜率推断当前窗口的y坐标
+        cur_y = last_y + k * dx
+        # 添加到滑动窗口日志
+        sld_win_hist.append((cur_x, cur_y))
+        # 寻找候选点
+        roi_pt_idx = np.bitwise_and(
+            np.abs(rb_x - cur_x) < tk.WIN_H/2,
+            np.abs(rb_y - cur_y) < tk.WIN_W/2)
+        # 计算ROI区域的点的个数
+        roi_pt_n = np.sum(roi_pt_idx)
+        if roi_pt_n == 0:
+            # 继续向后查找
+            continue
+        # 标记点集的访问记录
+        is_pt_visited = np.bitwise_or(is_pt_visited, roi_pt_idx)
+        # 计算均值重新修正cur_y
+        cur_y = np.mean(rb_y[roi_pt_idx])
+        # 添加曲线样本点
+        curve_x.append(cur_x)
+        curve_y.append(cur_y)
+        # 更新斜率
+        k = (cur_y - last_y) / (cur_x - last_x)
+        # 增加曲线的长度
+        curve_len += math.sqrt((cur_x - last_x)**2 + (cur_y-last_y)**2)
+        # print('curve length: {} cur_x={} last_x={} cur_y={} last_y={}'.format(curve_len, cur_x, last_x, cur_y, last_y))
+        # 更新上一个点
+        last_x, last_y = cur_x, cur_y
+
+    curve_x = np.float32(curve_x)
+    curve_y = np.float32(curve_y)
+
+    return curve_x, curve_y, curve_len, sld_win_hist, is_pt_visited
+
+def has_curve2_legacy(tk, rb_x, rb_y, tail, is_pt_visited):
+    '''判断是否存在曲线2(原始实现, 作为回归测试的基准)'''
+    if tail is None:
+        return False
+    # tail 曲线1末端的点
+    tail_x, tail_y = tail
+    # 获得末端点在ROI区域内未被访问到的点
+    tail_roi_pt_idx = np.bitwise_and(
+        np.abs(rb_x - tail_x) < tk.TAIL_ROI_W/2,
+        np.abs(rb_y - tail_y) < tk.TAIL_ROI_H/2)
+    # 必须还是未被访问过的点
+    tail_roi_pt_idx = np.bitwise_and(np.bitwise_not(is_pt_visited), tail_roi_pt_idx)
+    # 统计ROI区域内未被访问过的点的个数
+    roi_n = np.sum(tail_roi_pt_idx)
+    if roi_n < tk.TAIL_ROI_MIN_PT:
+        # 判断没有曲线2
+        return False, 0
+    # 分别统计采样框上部跟下部的分布
+    roi_y = rb_y[tail_roi_pt_idx]
+    roi_n_posi = np.sum(roi_y > tail_y)
+    roi_n_negi = roi_n - roi_n_posi
+    # 获得曲线2的采样方向
+    dir_y = tk.DIR_Y_POSI if roi_n_posi > roi_n_negi else tk.DIR_Y_NEGI
+    return True, dir_y
+
+def c2_pt_sample_legacy(tk, rb_x, rb_y, root, dir_y):
+    '''曲线2滑动窗口采样(原始实现, 每一步遍历全部的点, 作为回归测试的基准)'''
+    # 曲线拟合的起始点
+    root_x, root_y = root
+    # 根据遍历方向先对y坐标进行初筛
+    pt_idx = rb_y > root_y if dir_y == tk.DIR_Y_POSI else rb_y < root_y
+    # 对y坐标进行筛选排序(默认顺序是从小到大)
+    rb_y_unique = np.sort(list(set(rb_y[pt_idx])))
+    if dir_y == tk.DIR_Y_NEGI:
+        # 如果遍历顺序是Y轴负方向, 需要对rb_y_unique倒序
+        rb_y_unique = rb_y_unique[::-1]
+
+    # 采样框的记录
+    sld_win_hist = []
+    # 记录样本点是否被采样过
+    is_pt_visited = np.zeros_like(rb_x, dtype=bool)
+    # 曲线的采样点的集合
+    curve_x = [root_x, ]
+    curve_y = [root_y, ]
+    # 曲线的长度
+    curve_len = 0
+    # 添加滑动窗口日志
+    sld_win_hist.append((root_x, root_y))
+    # 惯性力(斜率)
+    k = 0
+    # 赋值上一次的点坐标
+    last_x, last_y = root_x, root_y
+    cur_x, cur_y = last_x, last_y
+    # 遍历后续的y坐标
+    for y_idx in range(1, len(rb_y_unique)):
+        cur_y = rb_y_unique[y_idx]
+        dy = cur_y - last_y
+        if dy > tk.WIN_MAX_GAP:
+            # 间隙过大,停止采样
+            break
+        # 根据斜率推算出当前窗口的y坐标
+        cur_x = last_x + k * dy
+        # 添加到滑动窗口日志
+        sld_win_hist.append((cur_x, cur_y))
+        # 寻找候选点
+        roi_pt_idx = np.bitwise_and(
+            np.abs(rb_x - cur_x) < tk.WIN_W/2,
+            np.abs(rb_y - cur_y) < tk.WIN_H/2)
+        # 计算窗口内的点的个数
+        roi_pt_n = np.sum(roi_pt_idx)
+        if roi_pt_n == 0:
+            # 继续向后查找
+            continue
+        # 修改点的访问记录
+        is_pt_visited = np.bitwise_or(is_pt_visited, roi_pt_idx)
+        # 计算均值 重新修正cur_x
+        cur_x = np.mean(rb_x[roi_pt_idx])
+        # 添加曲线样本
+        curve_x.append(cur_x)
+        curve_y.append(cur_y)
+        # 更新斜率
+        k = (cur_x - last_x) / (cur_y - last_y)
+        # 增加曲线长度
+        curve_len += math.sqrt((cur_x - last_x)**2 + (cur_y-last_y)**2)
+        # 更新上一个点
+        last_x, last_y = cur_x, cur_y
+
+    curve_x = np.float32(curve_x)
+    curve_y = np.float32(curve_y)
+
+    return curve_x, curve_y, curve_len, sld_win_hist, is_pt_visited
+
+def bench_ipm_remap():
+    '''IPM映射矩阵生成: 逐像素循环 vs 向量化'''
+    cam = Camera(CAM_PORT_NAME)
+    cam.load_cam_calib_data()
+
+    start = time.time()
+    loop_x, loop_y = calc_ipm_remap_loop(cam)
+    t_loop = time.time() - start
+
+    start = time.time()
+    vec_x, vec_y = cam.calc_ipm_remap()
+    t_vec = time.time() - start
+
+    start = time.time()
+    vec32_x, vec32_y = cam.calc_ipm_remap(dtype=np.float32)
+    t_vec32 = time.time() - start
+
+    is_same = np.allclose(loop_x, vec_x, equal_nan=True) and np.allclose(loop_y, vec_y, equal_nan=True)
+    logging.info('[IPM Remap] 逐像素循环: {:.3f}s'.format(t_loop))
+    logging.info('[IPM Remap] 向量化(float64): {:.3f}s 加速比: {:.1f}x'.format(t_vec, t_loop/t_vec))
+    logging.info('[IPM Remap] 向量化(float32): {:.3f}s 加速比: {:.1f}x'.format(t_vec32, t_loop/t_vec32))
+    logging.info('[IPM Remap] 计算结果是否一致: {}'.format(is_same))
+
+def load_images(img_path):
+    '''载入测试图像'''
+    img_list = [cv2.imread(f) for f in sorted(glob.glob('{}/*.png'.format(img_path)))]
+    return [img for img in img_list if img is not None]
+
+def bench_remap():
+    '''图像去除畸变: 浮点映射矩阵 vs 定点数映射矩阵 vs 局部区域'''
+    cam = Camera(CAM_PORT_NAME)
+    cam.load_cam_calib_data()
+    gray_list = [cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) for img in load_images(FLAGS.img_path)]
+    n_frame = len(gray_list) * FLAGS.repeat
+    # 局部区域: 图像中心 1/4 面积
+    h, w = gray_list[0].shape
+    roi = (w//4, h//4, w//2, h//2)
+
+    start = time.time()
+    for i in range(FLAGS.repeat):
+        for gray in gray_list:
+            cv2.remap(gray, cam.remap_x, cam.remap_y, cv2.INTER_LINEAR)
+    t_float = (time.time() - start) / n_frame
+
+    start = time.time()
+    for i in range(FLAGS.repeat):
+        for gray in gray_list:
+            cam.remove_distortion(gray)
+    t_fixed = (time.time() - start) / n_frame
+
+    start = time.time()
+    for i in range(FLAGS.repeat):
+        for gray in gray_list:
+            cam.remove_distortion(gray, roi=roi)
+    t_roi = (time.time() - start) / n_frame
+
+    # 定点数映射的插值精度为1/32像素, 与浮点映射的结果只有微小差异
+    max_diff = 0
+    for gray in gray_list:
+        img_float = cv2.remap(gray, cam.remap_x, cam.remap_y, cv2.INTER_LINEAR)
+        img_fixed = cam.remove_distortion(gray)
+        img_roi = cam.remove_distortion(gray, roi=roi)
+        max_diff = max(max_diff, int(cv2.absdiff(img_float, img_fixed).max()))
+        x, y, rw, rh = roi
+        assert np.array_equal(img_roi, img_fixed[y:y+rh, x:x+rw]), '局部区域去畸变的结果与整幅图像不一致'
+    logging.info('[Remap] 浮点映射矩阵: {:.3f}ms/帧'.format(t_float*1000))
+    logging.info('[Remap] 定点数映射矩阵: {:.3f}ms/帧 加速比: {:.1f}x'.format(t_fixed*1000, t_float/t_fixed))
+    logging.info('[Remap] 局部区域(1/4面积): {:.3f}ms/帧 加速比: {:.1f}x'.format(t_roi*1000, t_float/t_roi))
+    logging.info('[Remap] 浮点与定点数映射的最大像素差: {}'.format(max_diff))
+
+def load_track_fit():
+    '''各个测试项目共用的曲线拟合对象
+    不打开摄像头, 只载入标定数据, 透视逆变换矩阵在内存中计算(不依赖config/ipm_remap.bin)
+    '''
+    cam = Camera(CAM_PORT_NAME)
+    cam.load_cam_calib_data()
+    cam.ipm_remap_x, cam.ipm_remap_y = cam.calc_ipm_remap()
+    return TrackFit(cam)
+
+def load_point_clouds(tk, img_path):
+    '''从测试图像中提取机器人坐标系下的点云'''
+    pt_clouds = []
+    for img in load_images(img_path):
+        has_line, bin_line = tk.img_preprocess(img)
+        rb_x, rb_y = tk.pixel_ipm(bin_line)
+        if len(rb_x) > 0:
+            pt_clouds.append((rb_x, rb_y))
+    return pt_clouds
+
+def is_same_sample(sample_a, sample_b):
+    '''比较两次曲线采样的结果是否完全一致'''
+    curve_x_a, curve_y_a, len_a, hist_a, visited_a = sample_a
+    curve_x_b, curve_y_b, len_b, hist_b, visited_b = sample_b
+    return np.array_equal(curve_x_a, curve_x_b) and np.array_equal(curve_y_a, curve_y_b) \
+        and len_a == len_b and hist_a == hist_b and np.array_equal(visited_a, visited_b)
+
+def bench_c1_sample():
+    '''曲线1滑动窗口采样: 逐窗口遍历 vs 排序+二分查找 (同时做回归测试)'''
+    tk = load_track_fit()
+    pt_clouds = load_point_clouds(tk, FLAGS.img_path)
+    # 在采集的点云基础上, 添加随机扰动与重复点, 覆盖更多的情况
+    rng = np.random.default_rng(0)
+    for rb_x, rb_y in list(pt_clouds):
+        for i in range(FLAGS.n_random):
+            idx = rng.choice(len(rb_x), size=len(rb_x) * 4)
+            noise = np.float32(rng.normal(scale=0.5, size=(2, len(idx))))
+            pt_clouds.append((rb_x[idx] + noise[0], rb_y[idx] + noise[1]))
+    # 回归测试
+    n_diff = 0
+    for rb_x, rb_y in pt_clouds:
+        if not is_same_sample(c1_pt_sample_legacy(tk, rb_x, rb_y), tk.c1_pt_sample(rb_x, rb_y)):
+            n_diff += 1
+    logging.info('[C1 Sample] 点云个数: {} 结果不一致的个数: {}'.format(len(pt_clouds), n_diff))
+    assert len(pt_clouds) > 0, '没有可用的测试点云: {}'.format(FLAGS.img_path)
+    assert n_diff == 0, '曲线1采样的结果与原始实现不一致'
+
+    n_pt = np.mean([len(rb_x) for rb_x, rb_y in pt_clouds])
+    start = time.time()
+    for i in range(FLAGS.repeat):
+        for rb_x, rb_y in pt_clouds:
+            c1_pt_sample_legacy(tk, rb_x, rb_y)
+    t_legacy = (time.time() - start) / (FLAGS.repeat * len(pt_clouds))
+
+    start = time.time()
+    for i in range(FLAGS.repeat):
+        for rb_x, rb_y in pt_clouds:
+            tk.c1_pt_sample(rb_x, rb_y)
+    t_sorted = (time.time() - start) / (FLAGS.repeat * len(pt_clouds))
+    logging.info('[C1 Sample] 平均点数: {:.0f}'.format(n_pt))
+    logging.info('[C1 Sample] 逐窗口遍历: {:.3f}ms'.format(t_legacy*1000))
+    logging.info('[C1 Sample] 排序+二分查找: {:.3f}ms 加速比: {:.1f}x'.format(t_sorted*1000, t_legacy/t_sorted))
+
+def bench_c2_sample():
+    '''曲线2滑动窗口采样: 逐窗口遍历 vs 点云索引 (同时做回归测试)'''
+    tk = load_track_fit()
+    pt_clouds = load_point_clouds(tk, FLAGS.img_path)
+    rng = np.random.default_rng(0)
+    # 测试用例: 点云, 曲线1的尾巴, 曲线1的访问记录
+    # 除了曲线1真实的尾巴之外, 再随机选取点云中的点作为尾巴, 覆盖更多的情况
+    cases = []
+    for rb_x, rb_y in pt_clouds:
+        c1_x, c1_y, c1_len, c1_sld_win_hist, c1_pt_visited = tk.c1_pt_sample(rb_x, rb_y)
+        cases.append((rb_x, rb_y, (c1_x[-1], c1_y[-1]), c1_pt_visited))
+        for pt_idx in rng.choice(len(rb_x), size=FLAGS.n_random):
+            cases.append((rb_x, rb_y, (rb_x[pt_idx], rb_y[pt_idx]), c1_pt_visited))
+    # 回归测试
+    n_diff = 0
+    for rb_x, rb_y, tail, visited in cases:
+        if has_curve2_legacy(tk, rb_x, rb_y, tail, visited) != tk.has_curve2(rb_x, rb_y, tail, visited):
+            n_diff += 1
+        for dir_y in (tk.DIR_Y_POSI, tk.DIR_Y_NEGI):
+            if not is_same_sample(c2_pt_sample_legacy(tk, rb_x, rb_y, tail, dir_y), \
+                tk.c2_pt_sample(rb_x, rb_y, tail, dir_y)):
+                n_diff += 1
+    logging.info('[C2 Sample] 测试用例个数: {} 结果不一致的个数: {}'.format(len(cases), n_diff))
+    assert len(cases) > 0, '没有可用的测试点云: {}'.format(FLAGS.img_path)
+    assert n_diff == 0, '曲线2采样/曲线2判断的结果与原始实现不一致'
+
+    start = time.time()
+    for i in range(FLAGS.repeat):
+        for rb_x, rb_y, tail, visited in cases:
+            has_curve2_legacy(tk, rb_x, rb_y, tail, visited)
+            c2_pt_sample_legacy(tk, rb_x, rb_y, tail, tk.DIR_Y_POSI)
+    t_legacy = (time.time() - start) / (FLAGS.repeat * len(cases))
+
+    start = time.time()
+    for i in range(FLAGS.repeat):
+        for rb_x, rb_y, tail, visited in cases:
+            # 与curve_fit一致, 每一帧构建一次点云索引
+            pt_index = PointIndex(rb_x, rb_y)
+            tk.has_curve2(rb_x, rb_y, tail, visited, pt_index)
+            tk.c2_pt_sample(rb_x, rb_y, tail, tk.DIR_Y_POSI, pt_index)
+    t_index = (time.time() - start) / (FLAGS.repeat * len(cases))
+    logging.info('[C2 Sample] 逐窗口遍历: {:.3f}ms'.format(t_legacy*1000))
+    logging.info('[C2 Sample] 点云索引: {:.3f}ms 加速比: {:.1f}x'.format(t_index*1000, t_legacy/t_index))
+
+def quad_fit_incremental(x_arr, y_arr):
+    '''逐点累加之后求解, 与滑动窗口采样中的用法一致'''
+    quad_fit = QuadFit()
+    for x, y in zip(x_arr.tolist(), y_arr.tolist()):
+        quad_fit.add(x, y)
+    return quad_fit.solve()
+
+def bench_quad_fit():
+    '''二次曲线拟合: np.polyfit vs 正规方程闭式解 (同时做回归测试)'''
+    tk = load_track_fit()
+    pt_clouds = load_point_clouds(tk, FLAGS.img_path)
+    # 曲线1的采样点作为测试数据
+    curves = []
+    for rb_x, rb_y in pt_clouds:
+        c1_x, c1_y, c1_len, c1_sld_win_hist, c1_pt_visited = tk.c1_pt_sample(rb_x, rb_y)
+        if len(c1_x) >= 3:
+            curves.append((c1_x, c1_y))
+    # 随机生成的二次曲线样本
+    rng = np.random.default_rng(0)
+    for i in range(FLAGS.n_random):
+        x = np.float32(np.sort(rng.uniform(tk.RB_X_MIN, tk.RB_X_MAX, size=rng.integers(3, 40))))
+        y = np.float32(rng.normal(scale=0.01) * x**2 + rng.normal() * x + rng.normal(scale=10) + rng.normal(scale=0.5, size=len(x)))
+        curves.append((x, y))
+    assert len(curves) > 0, '没有可用的测试曲线'
+    # 计算结果的比较(拟合曲线在定义域内的最大偏差)
+    x_eval = np.linspace(tk.RB_X_MIN, tk.RB_X_MAX, num=20)
+    max_err = 0
+    for x, y in curves:
+        y_polyfit = np.polyval(np.polyfit(x, y, 2), x_eval)
+        for a, b, c, is_ok in (QuadFit.fit(x, y), quad_fit_incremental(x, y)):
+            max_err = max(max_err, np.max(np.abs(a*x_eval*x_eval + b*x_eval + c - y_polyfit)))
+    logging.info('[Quad Fit] 测试曲线个数: {} 与np.polyfit的最大偏差: {:.2e}'.format(len(curves), max_err))
+    assert max_err < 1e-6, '闭式解与np.polyfit的拟合结果不一致'
+    # 病态的情况不抛出异常, 退化为低阶的拟合
+    # 两个样本点: 退化为直线
+    a, b, c, is_ok = QuadFit.fit([10, 20], [1, 3])
+    logging.info('[Quad Fit] 两个样本点: a={:.3f} b={:.3f} c={:.3f} is_ok={}'.format(a, b, c, is_ok))
+    assert not is_ok and np.allclose((a, b, c), (0, 0.2, -1)), '两个样本点没有退化为直线'
+    # x坐标全部相同: 退化为常数(均值)
+    a, b, c, is_ok = QuadFit.fit([10, 10, 10], [1, 2, 3])
+    assert not is_ok and np.allclose((a, b, c), (0, 0, 2)), 'x坐标相同的样本点没有退化为常数'
+
+    def time_it(func):
+        start = time.time()
+        for i in range(FLAGS.repeat):
+            for x, y in curves:
+                func(x, y)
+        return (time.time() - start) / (FLAGS.repeat * len(curves))
+    t_polyfit = time_it(lambda x, y: np.polyfit(x, y, 2))
+    t_batch = time_it(QuadFit.fit)
+    # 滑动窗口采样时逐点累加(采样点本来就是逐个得到的)
+    t_incremental = time_it(quad_fit_incremental)
+    logging.info('[Quad Fit] np.polyfit: {:.3f}ms'.format(t_polyfit*1000))
+    logging.info('[Quad Fit] 闭式解(批量): {:.3f}ms 加速比: {:.1f}x'.format(t_batch*1000, t_polyfit/t_batch))
+    logging.info('[Quad Fit] 闭式解(逐点累加): {:.3f}ms 加速比: {:.1f}x'.format( \
+        t_incremental*1000, t_polyfit/t_incremental))
+
+def vision_loop_step(tk, cone, img, is_display):
+    '''单帧图像处理(巡线+交通锥), 与main.py中worker_cv的流程保持一致'''
+    frame = FramePyramid(img)
+    canvas_img = np.copy(frame.base) if is_display else None
+    has_line, bin_line = tk.img_preprocess(frame)
+    canvas_robo = tk.get_canvas() if is_display else None
+    if has_line:
+        rb_x, rb_y = tk.pixel_ipm(bin_line, canvas=canvas_img)
+        tk.curve_fit(rb_x, rb_y, is_draw=is_display, canvas=canvas_robo)
+    has_cone, bin_cone, cone_rect = cone.preprocessing(frame)
+    if has_cone:
+        distance, cone_posi = cone.cone_measure(cone_rect)
+        if is_display:
+            cone.visualization(has_cone, canvas_img, cone_rect=cone_rect, distance=distance, cone_posi=cone_posi)
+
+def bench_headless():
+    '''图像处理单帧耗时: 画面预览 vs 无画面(不创建画布, 不绘制)
+    同时检查画布的分配: 画面预览时每一帧只拷贝一次画布模板, 无画面时不分配画布
+    '''
+    img_list = load_images(FLAGS.img_path)
+    assert len(img_list) > 0, '没有可用的测试图像: {}'.format(FLAGS.img_path)
+    n_frame = FLAGS.repeat * len(img_list)
+    for is_display in (True, False):
+        tk = load_track_fit()
+        cone = TrafficConeDetect(tk.cam)
+        # 统计画布模板的拷贝次数
+        n_canvas = [0]
+        get_canvas = tk.get_canvas
+        def get_canvas_counted(*args, **kwargs):
+            n_canvas[0] += 1
+            return get_canvas(*args, **kwargs)
+        tk.get_canvas = get_canvas_counted
+        start = time.time()
+        for i in range(FLAGS.repeat):
+            for img in img_list:
+                vision_loop_step(tk, cone, img, is_display)
+        t_frame = (time.time() - start) / n_frame
+        if is_display:
+            t_display = t_frame
+            logging.info('[Headless] 画面预览: {:.3f}ms/帧 画布拷贝: {}次/{}帧'.format(t_frame*1000, n_canvas[0], n_frame))
+            assert n_canvas[0] == n_frame, '画面预览时每一帧应当只拷贝一次画布模板'
+        else:
+            logging.info('[Headless] 无画面: {:.3f}ms/帧 加速比: {:.1f}x'.format(t_frame*1000, t_display/t_frame))
+            assert n_canvas[0] == 0 and tk.canvas_tpl is None and 'canvas_robo' not in tk.bufs, \
+                '无画面时不应当分配画布'
+
+def draw_points_loop(canvas, px, py, radius, color):
+    '''逐个绘制实心圆点(原始实现, 作为性能对比的基准)'''
+    for idx in range(len(px)):
+        cv2.circle(canvas, (int(px[idx]), int(py[idx])), radius, thickness=-1, color=color)
+    return canvas
+
+def bench_draw():
+    '''可视化: 绘制占曲线拟合耗时的比例, 以及批量绘制圆点与逐个绘制的一致性'''
+    tk = load_track_fit()
+    img_list = load_images(FLAGS.img_path)
+    samples = []
+    for img in img_list:
+        has_line, bin_line = tk.img_preprocess(img)
+        rb_x, rb_y = tk.pixel_ipm(bin_line)
+        if len(rb_x) > 0:
+            samples.append((img, np.copy(bin_line), rb_x, rb_y))
+    assert len(samples) > 0, '没有可用的测试图像: {}'.format(FLAGS.img_path)
+    # 一致性: 批量绘制 vs 逐个cv2.circle
+    # 批量绘制会把画布边缘的圆心移入画布, 逐个绘制的圆心做同样的限制
+    radius = 3
+    n_diff = 0
+    for img, bin_line, rb_x, rb_y in samples:
+        px, py = tk.rb2pixel(rb_x, rb_y)
+        canvas_a = tk.draw_points(np.full((600, 800, 3), 255, np.uint8), px, py, radius, (125, 125, 125))
+        canvas_b = draw_points_loop(np.full((600, 800, 3), 255, np.uint8), \
+            np.clip(px, radius, 800-1-radius), np.clip(py, radius, 600-1-radius), radius, (125, 125, 125))
+        n_diff += np.count_nonzero(np.any(canvas_a != canvas_b, axis=2))
+    logging.info('[Draw] 批量绘制与逐个绘制不一致的像素个数: {}'.format(n_diff))
+    assert n_diff == 0, '批量绘制与逐个绘制的结果不一致'
+
+    def time_it(*funcs):
+        # 多个函数在同一个样本上交替执行, 每个样本取重复测量的最小值
+        # 减小单核上调度抖动与缓存状态对比例的影响
+        t_list = np.zeros((len(samples), len(funcs)))
+        t_list[:] = float('inf')
+        for s_idx, sample in enumerate(samples):
+            for i in range(FLAGS.repeat):
+                for f_idx, func in enumerate(funcs):
+                    start = time.perf_counter()
+                    func(*sample)
+                    t_list[s_idx, f_idx] = min(t_list[s_idx, f_idx], time.perf_counter() - start)
+        return t_list.mean(axis=0)
+    # 画布由调用者每帧获取一次(与main.py一致), 模板拷贝单独统计
+    canvas_robo = tk.get_canvas()
+    t_canvas, = time_it(lambda img, bin_line, rb_x, rb_y: tk.get_canvas())
+    t_fit, t_fit_draw = time_it(
+        lambda img, bin_line, rb_x, rb_y: tk.curve_fit(rb_x, rb_y),
+        lambda img, bin_line, rb_x, rb_y: tk.curve_fit(rb_x, rb_y, is_draw=True, canvas=canvas_robo))
+    canvas_img = np.copy(img_list[0])
+    t_ipm, t_ipm_draw = time_it(
+        lambda img, bin_line, rb_x, rb_y: tk.pixel_ipm(bin_line),
+        lambda img, bin_line, rb_x, rb_y: tk.pixel_ipm(bin_line, canvas=canvas_img))
+    draw_ratio = (t_fit_draw - t_fit) / t_fit * 100
+    logging.info('[Draw] 曲线拟合: {:.3f}ms 拟合+绘制: {:.3f}ms 绘制占拟合的比例: {:.0f}% 画布模板拷贝: {:.3f}ms'.format( \
+        t_fit*1000, t_fit_draw*1000, draw_ratio, t_canvas*1000))
+    logging.info('[Draw] 透视逆变换: {:.3f}ms 透视逆变换+绘制: {:.3f}ms'.format(t_ipm*1000, t_ipm_draw*1000))
+    assert draw_ratio <= FLAGS.draw_budget, '绘制占曲线拟合的比例{:.0f}%超出预算{}%'.format( \
+        draw_ratio, FLAGS.draw_budget)
+
+def filter_contours_legacy(tk, bin_line):
+    '''逐个轮廓计算面积并绘制(原始实现, 作为对比的基准)'''
+    bin_out = np.zeros_like(bin_line)
+    valid_cnt_num = 0
+    for cnt in tk.find_contours(bin_line):
+        if cv2.contourArea(cnt) > tk.MIN_CNT_AREA:
+            valid_cnt_num += 1
+            cv2.drawContours(image=bin_out, contours=[cnt], contourIdx=0, color=255, thickness=-1)
+    return valid_cnt_num, bin_out
+
+def bench_cc_filter():
+    '''连通域过滤: findContours+逐个轮廓绘制 vs connectedComponentsWithStats+标签查找表'''
+    tk = load_track_fit()
+    # 测试图像的二值化结果 + 随机噪声(连通域较多的情况)
+    masks = []
+    for img in load_images(FLAGS.img_path):
+        img_small = cv2.resize(img, dsize=None, fx=tk.IMG_SCALE_FACTOR, fy=tk.IMG_SCALE_FACTOR)
+        bin_line = cv2.inRange(img_small, lowerb=TRACK_BLACK_LOERB, upperb=TRACK_BLACK_UPPERB)
+        masks.append(cv2.dilate(bin_line, tk.DILATE_KERNEL))
+    n_image = len(masks)
+    rng = np.random.default_rng(0)
+    # 随机噪声同样经过膨胀(与img_preprocess一致), 稀疏的噪声产生大量面积在阈值附近的小连通域与空洞
+    for i in range(FLAGS.n_random):
+        noise = np.uint8(rng.random(masks[0].shape) < rng.uniform(0.005, 0.1)) * 255
+        masks.append(cv2.dilate(noise, tk.DILATE_KERNEL))
+    # 一致性: 有无直线的判断, 以及二值化结果(包括空洞的填充)
+    n_has_line_diff = 0
+    n_pixel_diff = 0
+    n_hole = 0
+    for i, bin_line in enumerate(masks):
+        num_a, bin_a = filter_contours_legacy(tk, bin_line)
+        num_b, bin_b = tk.filter_components(bin_line)
+        n_has_line_diff += (num_a >= 1) != (num_b >= 1)
+        n_pixel_diff += np.count_nonzero(bin_a != bin_b)
+        n_hole += np.count_nonzero(tk.fill_holes(bin_line) != bin_line) > 0
+    logging.info('[CC] 有无直线判断不一致: {}/{} 不一致的像素个数: {} 存在空洞的图像: {}'.format( \
+        n_has_line_diff, len(masks), n_pixel_diff, n_hole))
+    assert n_image > 0, '没有可用的测试图像: {}'.format(FLAGS.img_path)
+    assert n_has_line_diff == 0, '连通域过滤与轮廓过滤的有无直线判断不一致'
+    assert n_pixel_diff == 0, '连通域过滤与轮廓过滤的二值化结果不一致'
+
+    def time_it(func, mask_list):
+        start = time.time()
+        for i in range(FLAGS.repeat):
+            for bin_line in mask_list:
+                func(bin_line)
+        return (time.time() - start) / (FLAGS.repeat * len(mask_list))
+    for name, mask_list in (('测试图像', masks[:n_image]), ('随机噪声', masks[n_image:])):
+        if len(mask_list) == 0:
+            continue
+        t_legacy = time_it(lambda bin_line: filter_contours_legacy(tk, bin_line), mask_list)
+        t_cc = time_it(tk.filter_components, mask_list)
+        logging.info('[CC] {} 轮廓: {:.1f}us 连通域: {:.1f}us'.format(name, t_legacy*1e6, t_cc*1e6))
+
+def bench_alloc():
+    '''内存分配: 稳定状态下每一帧各个阶段的临时内存峰值(tracemalloc), 超出预算时断言失败'''
+    tk = load_track_fit()
+    cone = TrafficConeDetect(tk.cam)
+    img_list = load_images(FLAGS.img_path)
+    stage_peak = {} # 各个阶段的内存峰值 {阶段名称: 字节数}
+    frame_mem = [0, 0] # 当前帧开始时的内存, 单帧内存峰值
+
+    def measure(name, func):
+        '''统计func执行期间相对执行前新增的内存峰值'''
+        cur_mem = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        ret = func()
+        peak_mem = tracemalloc.get_traced_memory()[1]
+        stage_peak[name] = max(stage_peak.get(name, 0), peak_mem - cur_mem)
+        frame_mem[1] = max(frame_mem[1], peak_mem - frame_mem[0])
+        return ret
+
+    def frame_step(img):
+        '''单帧图像处理(无画面), 与vision_loop_step的流程一致'''
+        frame = FramePyramid(img)
+        has_line, bin_line = measure('img_preprocess', lambda: tk.img_preprocess(frame))
+        if has_line:
+            rb_x, rb_y = measure('pixel_ipm', lambda: tk.pixel_ipm(bin_line))
+            measure('curve_fit', lambda: tk.curve_fit(rb_x, rb_y))
+        measure('cone', lambda: cone.preprocessing(frame))
+
+    # 预热: 第一帧会分配缓存以及生成查找表
+    for img in img_list:
+        frame_step(img)
+    tracemalloc.start()
+    stage_peak.clear()
+    frame_mem[1] = 0
+    for i in range(FLAGS.repeat):
+        for img in img_list:
+            frame_mem[0] = tracemalloc.get_traced_memory()[0]
+            frame_step(img)
+    tracemalloc.stop()
+    frame_peak = frame_mem[1]
+    for name, peak in stage_peak.items():
+        logging.info('[Alloc] {}: {:.1f}KB'.format(name, peak/1024))
+    logging.info('[Alloc] 单帧内存峰值: {:.1f}KB 预算: {}KB'.format(frame_peak/1024, FLAGS.alloc_budget))
+    assert len(img_list) > 0, '没有可用的测试图像: {}'.format(FLAGS.img_path)
+    assert frame_peak <= FLAGS.alloc_budget * 1024, '单帧内存峰值{:.1f}KB超出预算{}KB'.format( \
+        frame_peak/1024, FLAGS.alloc_budget)
+
+def render_track_image(cam, coeff, shape=(480, 640), line_w=4.0, gray_bg=200, gray_line=40, noise=8, rng=None):
+    '''根据机器人坐标系下的曲线(y = a*x^2 + b*x + c)渲染赛道图像(白底黑线, 线宽line_w)'''
+    a, b, c = coeff
+    h, w = shape
+    rb_x, rb_y = cam.ipm_remap_x[:h, :w], cam.ipm_remap_y[:h, :w]
+    with np.errstate(invalid='ignore'):
+        is_line = (rb_x > 0) & (np.abs(rb_y - (a*rb_x*rb_x + b*rb_x + c)) < line_w/2)
+    img = np.full((h, w, 3), gray_bg, dtype=np.float32)
+    img[is_line] = gray_line
+    if rng is not None:
+        img += rng.normal(0, noise, img.shape)
+    return np.uint8(np.clip(img, 0, 255))
+
+def bench_refine():
+    '''多分辨率细化: 缩略图拟合 vs 高分辨率细化 (合成图像上的曲线误差与耗时)'''
+    tk = load_track_fit()
+    cam = tk.cam
+    rng = np.random.default_rng(0)
+    eval_x = np.arange(8, 30, 1.0) # 计算误差的x坐标
+    err_list = {False: [], True: []}
+    t_fit = {False: 0, True: 0}
+    for i in range(FLAGS.n_random):
+        coeff = (rng.uniform(-0.01, 0.01), rng.uniform(-0.5, 0.5), rng.uniform(-6, 6))
+        img = render_track_image(cam, coeff, rng=rng)
+        for is_refine in (False, True):
+            tk.track_coeff = None
+            frame = FramePyramid(img)
+            has_line, bin_line = tk.img_preprocess(frame)
+            if not has_line:
+                continue
+            rb_x, rb_y = tk.pixel_ipm(bin_line)
+            start = time.time()
+            tk.curve_fit(rb_x, rb_y, frame=frame if is_refine else None)
+            t_fit[is_refine] += time.time() - start
+            if tk.track_coeff is None:
+                continue
+            fit_y = np.polyval(tk.track_coeff, eval_x)
+            err_list[is_refine].append(np.mean(np.abs(fit_y - np.polyval(coeff, eval_x))))
+    for is_refine in (False, True):
+        errs = err_list[is_refine]
+        logging.info('[Refine] {} 平均误差: {:.2f}cm P90: {:.2f}cm 拟合耗时: {:.3f}ms ({}帧)'.format( \
+            '高分辨率细化' if is_refine else '缩略图拟合', np.mean(errs), np.percentile(errs, 90), \
+            t_fit[is_refine] / len(errs) * 1000, len(errs)))
+
+def world2robot(pose, xw, yw):
+    '''世界坐标系下的点转换到机器人坐标系, pose: (x, y, 偏航角 单位rad, 逆时针为正)'''
+    x, y, yaw = pose
+    dx, dy = xw - x, yw - y
+    return math.cos(yaw)*dx + math.sin(yaw)*dy, -math.sin(yaw)*dx + math.cos(yaw)*dy
+
+def bench_track_temporal():
+    '''巡线跟踪模式: 合成赛道上模拟机器人巡线, 跟踪模式与全局搜索的拟合误差对比 (同时做回归测试)
+    偏航角的符号约定与robot_turn一致: 偏航角误差为正时执行GoLeft, 即逆时针为正
+    动作组的真实位移与ACTION_FORWARD_DIS不同(前进左偏/右偏也会前进), 检验里程误差的容忍度
+    '''
+    tk_full = load_track_fit()
+    cam = tk_full.cam
+    # 动作组的真实运动: (前进的距离 单位cm, 偏航角的变化 单位°)
+    true_motion = {'GO_FORWARD': (GO_FORWARD_DIS_PER_STEP, 0), 'GO_LEFT': (3.0, 8.0), 'GO_RIGHT': (3.0, -8.0)}
+    # 世界坐标系下的赛道(左转的弯道)
+    track_xw = np.arange(0, 400, 1.0)
+    track_yw = 0.002 * track_xw * track_xw + 2
+    rng = np.random.default_rng(0)
+
+    eval_x = np.arange(8, 30, 1.0) # 计算误差的x坐标
+
+    def curve_err(coeff, coeff_true):
+        '''曲线与真值之间的平均偏差(单位cm)'''
+        return np.mean(np.abs(np.polyval(coeff, eval_x) - np.polyval(coeff_true, eval_x)))
+
+    def simulate(yaw_sign):
+        '''模拟巡线, yaw_sign为-1时反转IMU偏航角的符号(错误的约定)
+        返回值: 跟踪模式生效的帧数, 总帧数, 全局搜索/跟踪模式的拟合误差, 预测曲线的误差
+        '''
+        tk_track = TrackFit(cam)
+        tk_ref = TrackFit(cam)
+        pose = [0.0, 0.0, 0.0]
+        odom_dis = 0.0
+        n_track, n_frame = 0, 0
+        err_ref, err_track, err_pred = [], [], []
+        for i in range(FLAGS.n_random):
+            # 机器人坐标系下的赛道, 拟合为二次曲线之后渲染图像
+            rb_x, rb_y = world2robot(pose, track_xw, track_yw)
+            is_roi = (rb_x > tk_ref.RB_X_MIN) & (rb_x < tk_ref.RB_X_MAX)
+            coeff = QuadFit.fit(rb_x[is_roi], rb_y[is_roi])[:3]
+            frame = FramePyramid(render_track_image(cam, coeff, rng=rng))
+            odom = (odom_dis, yaw_sign * math.degrees(pose[2]))
+            pred_coeff = tk_track.predict_curve(odom)
+            if pred_coeff is not None:
+                err_pred.append(curve_err(pred_coeff, coeff))
+            yaw_ref = 0
+            for tk, tk_odom, err_list in ((tk_ref, None, err_ref), (tk_track, odom, err_track)):
+                has_line, bin_line = tk.img_preprocess(frame)
+                assert has_line, '合成的赛道图像中没有检测到直线'
+                pt_x, pt_y = tk.pixel_ipm(bin_line)
+                has_c1, has_c2, next_yaw, cross_ab, canvas = tk.curve_fit(pt_x, pt_y, odom=tk_odom)
+                assert has_c1, '合成的赛道图像中没有拟合出曲线1'
+                err_list.append(curve_err(tk.track_coeff, coeff))
+                if tk is tk_ref:
+                    yaw_ref = next_yaw
+            n_frame += 1
+            n_track += tk_track.is_tracking
+            # 与巡线的游戏逻辑一致, 根据全局搜索的结果选择动作组
+            if abs(yaw_ref) < 20:
+                action = 'GO_FORWARD'
+            elif yaw_ref > 0:
+                action = 'GO_LEFT'
+            else:
+                action = 'GO_RIGHT'
+            dis, dyaw = true_motion[action]
+            pose[0] += dis * math.cos(pose[2])
+            pose[1] += dis * math.sin(pose[2])
+            pose[2] += math.radians(dyaw)
+            odom_dis += ACTION_FORWARD_DIS[action]
+        return n_track, n_frame, np.mean(err_ref), np.mean(err_track), np.mean(err_pred)
+
+    n_track, n_frame, err_ref, err_track, err_pred = simulate(1)
+    logging.info('[Track] 跟踪模式生效: {}/{} 拟合误差 全局搜索: {:.2f}cm 跟踪模式: {:.2f}cm 预测曲线: {:.2f}cm'.format( \
+        n_track, n_frame, err_ref, err_track, err_pred))
+    _, _, _, _, err_pred_flip = simulate(-1)
+    logging.info('[Track] 偏航角符号取反 预测曲线误差: {:.2f}cm'.format(err_pred_flip))
+    assert n_track >= 0.8 * n_frame, '跟踪模式生效的帧数过少'
+    assert err_track <= err_ref + 0.2, '跟踪模式的拟合误差大于全局搜索'
+    assert err_pred < tk_full.TRACK_BAND / 2, '预测曲线的误差过大'
+    assert err_pred < err_pred_flip, '偏航角的符号约定与曲线预测不一致'
+
+def bench_v4l2_ctl():
+    '''相机参数下发: dry-run后端下的命令合并与增量下发(回归测试, 不需要摄像头), 以及命令执行失败时的处理'''
+    device = '/dev/video0'
+    fmt = (640, 480, 'MJPG')
+    ctrls = {'brightness': 0, 'contrast': 32, 'exposure_auto': 1, 'exposure_absolute': 100}
+    ctl = V4L2Control(device, backend=V4L2Control.BACKEND_DRY_RUN)
+    # 第一次下发: 模式参数(格式/帧率/自动曝光)与数值参数分两条命令
+    expected = [
+        ['v4l2-ctl', '-d', device, '--set-fmt-video=width=640,height=480,pixelformat=MJPG', '-p', '30', \
+            '--set-ctrl=exposure_auto=1'],
+        ['v4l2-ctl', '-d', device, '--set-ctrl=brightness=0,contrast=32,exposure_absolute=100']]
+    cmds = ctl.apply(ctrls, fmt=fmt, fps=30)
+    assert cmds == expected and ctl.history == expected, '参数合并之后的命令不一致: {}'.format(ctl.history)
+    # 参数没有变化: 不下发
+    assert ctl.apply(ctrls, fmt=fmt, fps=30) == [], '参数没有变化时仍然下发了命令'
+    # 只有数值参数变化: 一条命令, 只包含变化的参数
+    cmds = ctl.apply(dict(ctrls, brightness=10), fmt=fmt, fps=30)
+    assert cmds == [['v4l2-ctl', '-d', device, '--set-ctrl=brightness=10']], '增量下发的命令不一致: {}'.format(cmds)
+    assert len(ctl.history) == 3
+    # 命令执行失败(设备不存在或者没有安装v4l2-ctl): 参数不记录为已生效, 下一次重新下发
+    ctl_fail = V4L2Control('/dev/video_not_exist', backend=V4L2Control.BACKEND_V4L2_CTL)
+    cmds = ctl_fail.apply(ctrls, fmt=fmt, fps=30)
+    assert len(cmds) == 1, '模式命令失败之后不应该继续下发数值参数'
+    assert ctl_fail.applied == {} and ctl_fail.diff(ctrls) == ctrls, '执行失败的参数被记录为已生效'
+    logging.info('[V4L2] 命令合并/增量下发/执行失败 回归测试通过')
+
+    n_apply = 1000
+    start = time.time()
+    for i in range(n_apply):
+        ctl.apply(dict(ctrls, brightness=i % 64), fmt=fmt, fps=30)
+    logging.info('[V4L2] dry-run 单次下发(参数比较+命令生成): {:.1f}us'.format((time.time() - start) / n_apply * 1e6))
+
+def bench_decode():
+    '''MJPEG缩小比例解码(CAM_DECODE_REDUCED): 与全分辨率解码的巡线/交通锥结果对比, 以及解码耗时
+    注: 开启前需要确认二值化结果与拟合曲线的差异可以接受(阈值是在全分辨率解码的流程上调整的)
+    '''
+    tk_full, tk_reduced = load_track_fit(), load_track_fit()
+    cone = TrafficConeDetect(tk_full.cam)
+    # 测试图像重新编码为JPEG, 模拟相机输出的MJPEG数据
+    buf_list = [cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 90])[1] for img in load_images(FLAGS.img_path)]
+    assert len(buf_list) > 0, '没有可用的测试图像: {}'.format(FLAGS.img_path)
+    n_has_line_diff, n_mask_diff, n_mask_px, n_c1_diff, n_cone_diff = 0, 0, 0, 0, 0
+    yaw_diff = []
+    for buf in buf_list:
+        ret = []
+        for tk, decode_scale in ((tk_full, 1.0), (tk_reduced, tk_reduced.DECODE_SCALE)):
+            frame = FramePyramid(mjpeg_buf=buf, decode_scale=decode_scale, cam=tk.cam)
+            has_line, bin_line = tk.img_preprocess(frame)
+            bin_line = np.copy(bin_line)
+            has_c1, next_yaw = False, 0
+            if has_line:
+                rb_x, rb_y = tk.pixel_ipm(bin_line)
+                has_c1, has_c2, next_yaw, cross_ab, canvas = tk.curve_fit(rb_x, rb_y)
+            bin_cone = np.copy(cone.preprocessing(frame)[1])
+            ret.append((has_line, bin_line, has_c1, next_yaw, bin_cone))
+        (line_a, bin_a, c1_a, yaw_a, cone_a), (line_b, bin_b, c1_b, yaw_b, cone_b) = ret
+        n_has_line_diff += line_a != line_b
+        n_mask_diff += np.count_nonzero(bin_a != bin_b)
+        n_mask_px += np.count_nonzero(bin_a)
+        n_c1_diff += c1_a != c1_b
+        if c1_a and c1_b:
+            yaw_diff.append(abs(yaw_a - yaw_b))
+        n_cone_diff += np.count_nonzero(cone_a != cone_b)
+    logging.info('[Decode] 有无直线不一致: {}/{} 直线二值化不一致的像素: {}/{} 曲线1有无不一致: {}'.format( \
+        n_has_line_diff, len(buf_list), n_mask_diff, n_mask_px, n_c1_diff))
+    if len(yaw_diff) > 0:
+        logging.info('[Decode] 偏航角之差 平均: {:.2f}° 最大: {:.2f}°'.format(np.mean(yaw_diff), np.max(yaw_diff)))
+    logging.info('[Decode] 交通锥二值化不一致的像素: {}'.format(n_cone_diff))
+
+    for name, decode_scale in (('全分辨率', 1.0), ('缩小比例', tk_reduced.DECODE_SCALE)):
+        start = time.time()
+        for i in range(FLAGS.repeat):
+            for buf in buf_list:
+                tk_full.img_preprocess(FramePyramid(mjpeg_buf=buf, decode_scale=decode_scale, cam=tk_full.cam))
+        t_frame = (time.time() - start) / (FLAGS.repeat * len(buf_list))
+        logging.info('[Decode] {} 解码+预处理: {:.3f}ms/帧'.format(name, t_frame*1000))
+
+BENCHMARKS = {
+    'ipm_remap': bench_ipm_remap,
+    'remap': bench_remap,
+    'c1_sample': bench_c1_sample,
+    'c2_sample': bench_c2_sample,
+    'quad_fit': bench_quad_fit,
+    'headless': bench_headless,
+    'draw': bench_draw,
+    'cc_filter': bench_cc_filter,
+    'alloc': bench_alloc,
+    'refine': bench_refine,
+    'track_temporal': bench_track_temporal,
+    'v4l2_ctl': bench_v4l2_ctl,
+    'decode': bench_decode,
+}
+
+def main(argv):
+    BENCHMARKS[FLAGS.bench]()
+
+if __name__ == '__main__':
+    from absl import app
+    from absl import flags
+
+    # 设置日志等级
+    logging.basicConfig(level=logging.INFO)
+    # 定义参数
+    FLAGS = flags.FLAGS
+    flags.DEFINE_enum('bench', 'ipm_remap', list(BENCHMARKS.keys()), '性能测试的项目')
+    flags.DEFINE_string('img_path', 'data/image_raw', '测试图像的路径')
+    flags.DEFINE_integer('repeat', 50, '每张测试图像的重复次数')
+    flags.DEFINE_integer('n_random', 20, '每个点云生成的随机扰动点云的个数')
+    flags.DEFINE_integer('alloc_budget', 48, '稳定状态下单帧临时内存峰值的预算(KB)')
+    flags.DEFINE_integer('draw_budget', 25, '绘制占曲线拟合耗时比例的预算(%)')
+    app.run(main)
@@ -9,13 +9,91 @@
    当前的参数设置仅对机型KS2A418适用
 '''
 import time
+import logging
 import cv2
 import numpy as np
 import pickle
 import subprocess
 import math
+import json
+import os
 from config import *
 
+class V4L2Control:
+	'''UVC相机参数控制
+	将需要设置的参数合并成一条v4l2-ctl命令(不经过shell)一次性下发,
+	并记录已经生效的数值, 之后只下发发生变化的参数
+	'''
+	BACKEND_V4L2_CTL = 'v4l2-ctl' # 调用v4l2-ctl设置参数
+	BACKEND_DRY_RUN = 'dry-run' # 只记录命令不执行, 无需摄像头即可测试
+	# 模式类参数, 需要先于对应的数值参数生效
+	# 例如只有关闭自动曝光之后, 绝对曝光时间的设置才有效
+	MODE_CTRLS = ('white_balance_temperature_auto', 'exposure_auto')
+
+	def __init__(self, device, backend=BACKEND_V4L2_CTL):
+		self.device = device
+		self.backend = backend
+		self.applied = {} # 已经生效的参数
+		self.history = [] # 执行过的命令
+
+	def diff(self, ctrls):
+		'''筛选出数值发生变化的参数'''
+		return {name: value for name, value in ctrls.items() if self.applied.get(name) != value}
+
+	def run(self, cmd):
+		'''执行一条命令, 返回是否执行成功'''
+		if self.backend == self.BACKEND_DRY_RUN:
+			return True
+		try:
+			ret = subprocess.call(cmd)
+		except OSError as e:
+			logging.error('[V4L2] 命令执行失败: {} {}'.format(' '.join(cmd), e))
+			return False
+		if ret != 0:
+			logging.error('[V4L2] 命令执行失败(返回值{}): {}'.format(ret, ' '.join(cmd)))
+			return False
+		return True
+
+	def apply(self, ctrls, fmt=None, fps=None):
+		'''下发参数, 返回实际执行的命令列表
+		ctrls: 参数字典 {参数名: 数值}
+		fmt: 图像格式 (宽度, 高度, 编码方式)
+		fps: 帧率
+		注: 只有执行成功的命令中的参数才会被记录为已生效, 失败的参数下一次调用时重新下发
+		'''
+		changed = self.diff(ctrls)
+		mode_args = []
+		mode_applied = {} # 模式命令执行成功之后生效的参数
+		if fmt is not None and self.applied.get('fmt') != fmt:
+			mode_args.append('--set-fmt-video=width={},height={},pixelformat={}'.format(*fmt))
+			mode_applied['fmt'] = fmt
+		if fps is not None and self.applied.get('fps') != fps:
+			mode_args += ['-p', str(fps)]
+			mode_applied['fps'] = fps
+		mode_ctrls = {name: changed.pop(name) for name in self.MODE_CTRLS if name in changed}
+		if mode_ctrls:
+			mode_args.append('--set-ctrl={}'.format(','.join('{}={}'.format(name, value) for name, value in mode_ctrls.items())))
+			mode_applied.update(mode_ctrls)
+		value_args = ['--set-ctrl={}'.format(','.join('{}={}'.format(name, value) for name, value in changed.items()))] if changed else []
+		# 模式参数与数值参数同时变化时, 需要分两次下发, 其余情况只需要一条命令
+		if mode_ctrls and changed:
+			batches = [(mode_args, mode_applied), (value_args, changed)]
+		else:
+			batches = [(mode_args + value_args, dict(mode_applied, **changed))]
+		cmds = []
+		for args, batch_applied in batches:
+			if not args:
+				continue
+			cmd = ['v4l2-ctl', '-d', self.device] + args
+			cmds.append(cmd)
+			self.history.append(cmd)
+			if not self.run(cmd):
+				# 数值参数依赖模式参数, 模式命令失败时后续命令不再下发
+				break
+			# 记录已经生效的参数
+			self.applied.update(batch_applied)
+		return cmds
+
 class Camera:
 	'''Camera全局曝光全局快门UVC免驱摄像头'''	
 	# 设置图像分辨率
@@ -38,47 +116,60 @@ class Camera:
 	h = CAM_H 
 	# 相机光心与水平面的夹角 (俯仰角) 单位弧度
 	theta = np.radians(CAM_PITCH)
-	def __init__(self, device):
+	# 标定数据包的格式版本号
+	CALIB_BUNDLE_VERSION = 1
+	# 标定数据包中各个矩阵对应的文件名
+	CALIB_BUNDLE_ARRAYS = ('remap_x', 'remap_y', 'ipm_remap_x', 'ipm_remap_y')
+	def __init__(self, device, ctl_backend=CAM_CTL_BACKEND):
 		self.device = device
+		self.intrinsic = None # 相机内参(尚未载入)
+		self.scaled_remap = {} # 缩放图像对应的去畸变映射矩阵 {缩放比例: (remap_x, remap_y)}
+		self.fixed_remap = {} # 定点数格式的去畸变映射矩阵 {缩放比例: (map1, map2)}
+		# 相机参数控制器
+		self.ctl = V4L2Control(device, backend=ctl_backend)
 	
 	def init_camera(self):
-		# 设置分辨率
-		subprocess.call("v4l2-ctl -d {} --set-fmt-video=width={},height={},pixelformat=MJPG".format(self.device,self.IMG_WIDTH,self.IMG_HEIGHT), shell=True)
-		# 设置帧率
-		subprocess.call("v4l2-ctl -d {} -p {}".format(self.device, self.FPS), shell=True)
-		# 打开自动白平衡
-		subprocess.call("v4l2-ctl -d {} --set-ctrl white_balance_temperature_auto={}".format(self.device, self.AWB), shell=True)
+		'''相机参数初始化
+		所有参数合并为一次v4l2-ctl调用下发, 重复调用时只下发数值发生变化的参数
+		'''
+		ctrls = {}
+		# 自动白平衡
+		ctrls['white_balance_temperature_auto'] = int(self.AWB)
 		if not self.AWB:
-			subprocess.call("v4l2-ctl -d {} --set-ctrl white_balance_temperature={}".format(self.device, self.WHITE_BALANCE_TEMPRATURE), shell=True)
-		# 设置亮度
-		subprocess.call("v4l2-ctl -d {} --set-ctrl brightness={}".format(self.device, self.BRIGHNESS), shell=True)
-		# 设置饱和度
-		subprocess.call("v4l2-ctl -d {} --set-ctrl saturation={}".format(self.device, self.SATURATION), shell=True)
-		# 设置锐度(图像清晰度)
-		subprocess.call("v4l2-ctl -d {} --set-ctrl sharpness={}".format(self.device, self.SHARPNESS), shell=True)
-		# 设置色调
-		subprocess.call("v4l2-ctl -d {} --set-ctrl hue={}".format(self.device, self.HUE), shell=True)
-		# 设置对比度
-		subprocess.call("v4l2-ctl -d {} --set-ctrl contrast={}".format(self.device, self.CONTRUST), shell=True)
-		# 设置Gamma
-		subprocess.call("v4l2-ctl -d {} --set-ctrl gamma={}".format(self.device, self.GAMMA), shell=True)
-
+			ctrls['white_balance_temperature'] = self.WHITE_BALANCE_TEMPRATURE
+		# 亮度
+		ctrls['brightness'] = self.BRIGHNESS
+		# 饱和度
+		ctrls['saturation'] = self.SATURATION
+		# 锐度(图像清晰度)
+		ctrls['sharpness'] = self.SHARPNESS
+		# 色调
+		ctrls['hue'] = self.HUE
+		# 对比度
+		ctrls['contrast'] = self.CONTRUST
+		# Gamma
+		ctrls['gamma'] = self.GAMMA
 		if not self.EXPOSURE_AUTO:
-			subprocess.call("v4l2-ctl -d {} --set-ctrl exposure_auto=1".format(self.device), shell=True)
+			# 手动曝光
+			ctrls['exposure_auto'] = 1
 			# 设置绝对曝光时间
 			# 取值范围1 - 8188
-			subprocess.call("v4l2-ctl -d {} --set-ctrl exposure_absolute={}".format(self.device, self.EXPOSURE_ABSOLUTE), shell=True)
+			ctrls['exposure_absolute'] = self.EXPOSURE_ABSOLUTE
 		else:
 			# 自动曝光
-			subprocess.call("v4l2-ctl -d {} --set-ctrl exposure_auto=3".format(self.device), shell=True)
-		
-		# time.sleep(2)
+			ctrls['exposure_auto'] = 3
+		# 分辨率与帧率也一起下发
+		self.ctl.apply(ctrls, fmt=(self.IMG_WIDTH, self.IMG_HEIGHT, 'MJPG'), fps=self.FPS)
+
 		if self.IS_DEBUG:
 			# 打印配置结果
-			subprocess.call("v4l2-ctl -d {} --all".format(self.device), shell=True)
+			subprocess.call(['v4l2-ctl', '-d', self.device, '--all'])
 
-	def get_video_capture(self):
-		'''生成Capture对象'''
+	def get_video_capture(self, raw_mjpeg=False):
+		'''生成Capture对象
+		raw_mjpeg: 是否直接返回MJPEG原始码流(不解码), 
+			之后可以通过decode_mjpeg按需缩小比例解码
+		'''
 		capture = None
 		try:
 			capture = cv2.VideoCapture(int(self.device[-1]), cv2.CAP_V4L2)
@@ -92,45 +183,125 @@ class Camera:
 		# 缓冲区设置为1结果就是帧率只有 15fps
 		# 缓冲区设置为2之后帧率提升到40FPS
 		capture.set(cv2.CAP_PROP_BUFFERSIZE, 2) #设置视频缓冲区为1
+		if raw_mjpeg:
+			# 关闭格式转换, read()返回的是MJPEG的原始数据
+			capture.set(cv2.CAP_PROP_CONVERT_RGB, 0)
 		return capture
 	
+	def decode_mjpeg(self, buf, scale=1.0):
+		'''MJPEG解码
+		利用libjpeg的DCT缩放, 直接解码出1/2, 1/4, 1/8尺寸的图像,
+		选取不小于scale的最小的缩放比例, 省去全分辨率解码之后再缩放的开销
+		返回值: 图像, 图像相对原图的缩放比例
+		'''
+		for reduce, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), \
+				(2, cv2.IMREAD_REDUCED_COLOR_2)):
+			if 1.0 / reduce >= scale:
+				return cv2.imdecode(buf, flag), 1.0 / reduce
+		# 需要原始分辨率的图像
+		return cv2.imdecode(buf, cv2.IMREAD_COLOR), 1.0
+
+	def scaled_intrinsic(self, scale):
+		'''缩放之后的图像对应的相机内参'''
+		intrinsic = np.float64(self.intrinsic).copy()
+		# 焦距按比例缩放
+		intrinsic[0, 0] *= scale
+		intrinsic[1, 1] *= scale
+		# 图像中心需要考虑像素中心的偏移
+		intrinsic[0, 2] = (intrinsic[0, 2] + 0.5) * scale - 0.5
+		intrinsic[1, 2] = (intrinsic[1, 2] + 0.5) * scale - 0.5
+		return intrinsic
+	
 	def load_cam_calib_data(self, file_path='config/camera_info.bin'):
 		'''载入相机标定数据'''
 		# 读取标定参数
 		with open(file_path, 'rb') as f:
 			camera_info = pickle.load(f)
-			# 获取摄像头内参
-			self.intrinsic = camera_info['intrinsic']
-			# 获取摄像头的畸变系数
-			self.distortion = camera_info['distortion']
 			# x轴的映射
 			self.remap_x = camera_info['remap_x']
 			# y轴映射
 			self.remap_y = camera_info['remap_y']
-			# 根据相机标定参数
-			# 提取图像中心(cx, cy)与焦距f(单位：像素)
-			self.f = (self.intrinsic[0, 0] + self.intrinsic[1, 1])/2
-			# 图像中心的坐标
-			self.cx = self.intrinsic[0, 2]
-			self.cy = self.intrinsic[1, 2]
-			# 生成视场角等相关参数
-			self.alpha1 = np.arctan(self.cy/self.f)
-			self.alpha2 = np.arctan((self.IMG_HEIGHT-self.cy)/self.f)
-			self.beta1 = np.arctan(self.cx/self.f)
-			self.beta2 = np.arctan((self.IMG_WIDTH-self.cx)/self.f)
+			# 摄像头内参与畸变系数
+			self.set_intrinsic(camera_info['intrinsic'], camera_info['distortion'])
+		# 预先生成定点数格式的去畸变映射矩阵
+		self.get_fixed_remap()
 	
+	def set_intrinsic(self, intrinsic, distortion):
+		'''设置相机内参与畸变系数, 并生成视场角等相关参数'''
+		# 获取摄像头内参
+		self.intrinsic = intrinsic
+		# 获取摄像头的畸变系数
+		self.distortion = distortion
+		# 标定数据更新之后, 清空缩放图像的去畸变映射矩阵
+		self.scaled_remap = {}
+		self.fixed_remap = {}
+		# 根据相机标定参数
+		# 提取图像中心(cx, cy)与焦距f(单位：像素)
+		self.f = (self.intrinsic[0, 0] + self.intrinsic[1, 1])/2
+		# 图像中心的坐标
+		self.cx = self.intrinsic[0, 2]
+		self.cy = self.intrinsic[1, 2]
+		# 生成视场角等相关参数
+		self.alpha1 = np.arctan(self.cy/self.f)
+		self.alpha2 = np.arctan((self.IMG_HEIGHT-self.cy)/self.f)
+		self.beta1 = np.arctan(self.cx/self.f)
+		self.beta2 = np.arctan((self.IMG_WIDTH-self.cx)/self.f)
+
+	def dump_calib_bundle(self, dir_path=CAM_CALIB_BUNDLE):
+		'''将标定数据与IPM映射矩阵保存为标定数据包
+		内参等小数据存放在meta.json, 映射矩阵以float32格式存放在独立的.npy文件中
+		'''
+		os.makedirs(dir_path, exist_ok=True)
+		meta = {
+			'version': self.CALIB_BUNDLE_VERSION,
+			'img_width': self.IMG_WIDTH,
+			'img_height': self.IMG_HEIGHT,
+			'intrinsic': np.float64(self.intrinsic).tolist(),
+			'distortion': np.float64(self.distortion).tolist(),
+		}
+		for name in self.CALIB_BUNDLE_ARRAYS:
+			np.save(os.path.join(dir_path, '{}.npy'.format(name)), \
+				np.ascontiguousarray(getattr(self, name), dtype=np.float32))
+		# 最后写入meta.json, 作为数据包完整的标志
+		with open(os.path.join(dir_path, 'meta.json'), 'w') as f:
+			json.dump(meta, f, indent=4)
+
+	def load_calib_bundle(self, dir_path=CAM_CALIB_BUNDLE, mmap_mode='r'):
+		'''载入标定数据包
+		映射矩阵通过内存映射(mmap)的方式载入, 多个进程共享同一份物理内存页,
+		不需要再反序列化与拷贝数据
+		'''
+		with open(os.path.join(dir_path, 'meta.json'), 'r') as f:
+			meta = json.load(f)
+		if meta['version'] != self.CALIB_BUNDLE_VERSION:
+			raise ValueError('标定数据包版本不匹配: {} != {}'.format(meta['version'], self.CALIB_BUNDLE_VERSION))
+		if (meta['img_width'], meta['img_height']) != (self.IMG_WIDTH, self.IMG_HEIGHT):
+			raise ValueError('标定数据包的图像尺寸与相机配置不一致')
+		for name in self.CALIB_BUNDLE_ARRAYS:
+			setattr(self, name, np.load(os.path.join(dir_path, '{}.npy'.format(name)), mmap_mode=mmap_mode))
+		self.set_intrinsic(np.float64(meta['intrinsic']), np.float64(meta['distortion']))
+		# 预先生成定点数格式的去畸变映射矩阵
+		self.get_fixed_remap()
+
+	def calc_ipm_remap(self, dtype=np.float64):
+		'''计算IPM映射矩阵
+		通过meshgrid构造所有像素的坐标, 一次性批量完成透视逆变换
+		dtype: 映射矩阵的数据类型, 可选np.float32以减少内存占用
+		'''
+		# 构造像素坐标网格 尺寸为 (IMG_HEIGHT, IMG_WIDTH)
+		px, py = np.meshgrid(np.arange(self.IMG_WIDTH, dtype=np.float64), \
+			np.arange(self.IMG_HEIGHT, dtype=np.float64))
+		# 地平线以上的像素没有对应的地面坐标, 忽略除零等数值警告
+		with np.errstate(divide='ignore', invalid='ignore'):
+			ipm_remap_x, ipm_remap_y = self.inverse_projection_mapping(px, py)
+		return ipm_remap_x.astype(dtype), ipm_remap_y.astype(dtype)
 
-	def load_ipm_remap(self, calc_online=True, file_path='config/ipm_remap.bin'):
+	def load_ipm_remap(self, calc_online=True, file_path='config/ipm_remap.bin', dtype=np.float64):
 		'''载入IPM映射矩阵'''
 		if calc_online:
 			print('计算IPM映射矩阵, 并存储在 {}'.format(file_path))
 			# 构造透视逆变换矩阵
-			self.ipm_remap_x = np.zeros((self.IMG_HEIGHT, self.IMG_WIDTH))
-			self.ipm_remap_y = np.zeros((self.IMG_HEIGHT, self.IMG_WIDTH))
-			# 修改每一个元素里面的值
-			for px in range(self.IMG_WIDTH):
-				for py in range(self.IMG_HEIGHT):
-					self.ipm_remap_x[py][px],self.ipm_remap_y[py][px] = self.inverse_projection_mapping(px, py)
+			self.ipm_remap_x, self.ipm_remap_y = self.calc_ipm_remap(dtype=dtype)
 			# 保存数据
 			ipm_remap_data = {}
 			ipm_remap_data['ipm_remap_x'] = self.ipm_remap_x
@@ -146,9 +317,41 @@ class Camera:
 				self.ipm_remap_x = ipm_remap_data['ipm_remap_x']
 				self.ipm_remap_y = ipm_remap_data['ipm_remap_y']
 		
-	def remove_distortion(self, image):
-		'''图像去除畸变'''
-		return cv2.remap(image, self.remap_x, self.remap_y, cv2.INTER_LINEAR)
+	def get_remap(self, scale=1.0):
+		'''获取缩放之后的图像对应的去畸变映射矩阵'''
+		if scale == 1.0:
+			return self.remap_x, self.remap_y
+		if scale not in self.scaled_remap:
+			h, w = self.remap_x.shape[:2]
+			dsize = (int(round(w * scale)), int(round(h * scale)))
+			# 在缩放后的像素中心处采样映射矩阵, 再把坐标换算到缩放后的图像上
+			remap_x = (cv2.resize(np.float32(self.remap_x), dsize) + 0.5) * scale - 0.5
+			remap_y = (cv2.resize(np.float32(self.remap_y), dsize) + 0.5) * scale - 0.5
+			self.scaled_remap[scale] = (remap_x, remap_y)
+		return self.scaled_remap[scale]
+
+	def get_fixed_remap(self, scale=1.0):
+		'''获取定点数格式(CV_16SC2)的去畸变映射矩阵
+		cv2.remap使用定点数映射矩阵时, 省去了每个像素的浮点坐标拆分, 速度更快
+		'''
+		if scale not in self.fixed_remap:
+			remap_x, remap_y = self.get_remap(scale)
+			self.fixed_remap[scale] = cv2.convertMaps(np.float32(remap_x), np.float32(remap_y), cv2.CV_16SC2)
+		return self.fixed_remap[scale]
+
+	def remove_distortion(self, image, scale=1.0, roi=None):
+		'''图像去除畸变
+		scale: 图像相对原图的缩放比例
+		roi: 只对去畸变之后图像中的局部区域(x, y, w, h)进行去畸变, 为None时处理整幅图像
+		返回值: 去畸变之后的图像, roi不为None时只返回该区域
+		'''
+		map1, map2 = self.get_fixed_remap(scale)
+		if roi is not None:
+			x, y, w, h = roi
+			# 映射矩阵中存储的是原图中的绝对坐标, 截取ROI对应的部分即可
+			map1 = map1[y:y+h, x:x+w]
+			map2 = map2[y:y+h, x:x+w]
+		return cv2.remap(image, map1, map2, cv2.INTER_LINEAR)
 	
 	def inverse_projection_mapping(self, px, py):
 		'''逆向透视映射
@@ -174,6 +377,47 @@ class Camera:
 		
 		return self.ipm_remap_x[py][px], self.ipm_remap_y[py][px]
 
+	def inverse_projection_mapping2_batch(self, px, py, bilinear=False):
+		'''透视逆变换(批量), 直接从矩阵里面读取
+		px, py: 像素坐标数组, 支持numpy广播
+		bilinear: 是否使用双线性插值(亚像素精度), 为False时坐标取整后直接查表
+		返回值: rb_x, rb_y (float32数组)
+		'''
+		if not bilinear:
+			# 坐标限定在图像范围内
+			px = np.clip(px, 0, self.IMG_WIDTH-1).astype(np.intp)
+			py = np.clip(py, 0, self.IMG_HEIGHT-1).astype(np.intp)
+			return np.float32(self.ipm_remap_x[py, px]), np.float32(self.ipm_remap_y[py, px])
+		
+		px = np.clip(np.float32(px), 0, self.IMG_WIDTH-1)
+		py = np.clip(np.float32(py), 0, self.IMG_HEIGHT-1)
+		# 相邻的四个像素
+		x0 = np.floor(px).astype(np.intp)
+		y0 = np.floor(py).astype(np.intp)
+		x1 = np.minimum(x0 + 1, self.IMG_WIDTH-1)
+		y1 = np.minimum(y0 + 1, self.IMG_HEIGHT-1)
+		# 插值权重
+		wx = px - x0
+		wy = py - y0
+		def interp(table):
+			top = table[y0, x0] * (1 - wx) + table[y0, x1] * wx
+			bottom = table[y1, x0] * (1 - wx) + table[y1, x1] * wx
+			return np.float32(top * (1 - wy) + bottom * wy)
+		return interp(self.ipm_remap_x), interp(self.ipm_remap_y)
+
+	def projection_mapping(self, Xp, Yp):
+		'''透视映射(逆向透视映射的逆运算)
+		将机器人坐标系下地面上的点(Xp, Yp)投影到像素坐标系, 支持批量映射
+		注: Xp需要大于0(相机前方的地面)
+		'''
+		angle_puOg = self.theta - np.arctan(self.h / Xp)
+		up = self.f * np.tan(angle_puOg)
+		tan_puOp = -1 * Yp / np.sqrt(self.h**2 + Xp**2)
+		vp = tan_puOp * self.f / np.cos(angle_puOg)
+		px = vp + self.cx
+		py = -1 * up + self.cy
+		return px, py
+
 	
 def update_camera_param(camera, win_name='image_win'):
 	'''更新摄像头参数'''
@@ -0,0 +1,112 @@
+'''
+异步画面预览/录制
+图像处理进程只负责把画布放入有界队列(队列满了就丢弃最旧的一帧), 不会因为窗口刷新而阻塞,
+显示进程按照自己的节奏从队列中取出画面, 调用cv2.imshow显示, 或者写入视频文件
+'''
+import os
+import time
+import queue
+import logging
+import multiprocessing as mp
+import numpy as np
+import cv2
+
+def display_worker(canvas_queue, key_value, fps, record_dir):
+    '''子进程-画面预览/录制'''
+    win_names = set() # 已经创建的窗口
+    writers = {} # 视频录制 {窗口名称: VideoWriter}
+    while True:
+        try:
+            canvas_dict = canvas_queue.get(timeout=0.1)
+        except queue.Empty:
+            canvas_dict = {}
+        if canvas_dict is None:
+            # 收到结束标志
+            break
+        for win_name, canvas in canvas_dict.items():
+            if win_name not in win_names:
+                cv2.namedWindow(win_name, flags=cv2.WINDOW_NORMAL | cv2.WINDOW_KEEPRATIO | cv2.WINDOW_GUI_EXPANDED)
+                win_names.add(win_name)
+            cv2.imshow(win_name, canvas)
+            if record_dir is not None:
+                if win_name not in writers:
+                    os.makedirs(record_dir, exist_ok=True)
+                    h, w = canvas.shape[:2]
+                    video_path = os.path.join(record_dir, '{}_{}.avi'.format(win_name, time.strftime('%Y%m%d_%H%M%S')))
+                    writers[win_name] = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (w, h))
+                    logging.info('[Display] 录制画面 {}'.format(video_path))
+                if canvas.ndim == 2:
+                    canvas = cv2.cvtColor(canvas, cv2.COLOR_GRAY2BGR)
+                writers[win_name].write(canvas)
+        # 刷新窗口并记录按键
+        key = cv2.waitKey(1)
+        if key != -1:
+            key_value.value = key
+    for writer in writers.values():
+        writer.release()
+    cv2.destroyAllWindows()
+
+class DisplayProcess:
+    '''异步画面预览/录制'''
+    def __init__(self, fps=15, record_dir=None, maxsize=2):
+        '''
+        fps: 画面发布的最大帧率, 超出的画面直接丢弃(不拷贝)
+        record_dir: 画面录制的保存目录, 为None时不录制
+        maxsize: 队列的长度
+        '''
+        self.fps = fps
+        self.record_dir = record_dir
+        self.canvas_queue = mp.Queue(maxsize=maxsize)
+        self.key_value = mp.Value('i', -1) # 显示进程中最近一次的按键
+        self.process = None
+        self.last_publish_t = 0 # 上一次发布画面的时间
+
+    def start(self):
+        '''开启显示进程'''
+        self.process = mp.Process(target=display_worker, \
+            args=(self.canvas_queue, self.key_value, self.fps, self.record_dir), daemon=True)
+        self.process.start()
+        return self
+
+    def put_drop_oldest(self, item):
+        '''放入队列, 队列满了就丢弃最旧的一帧'''
+        while True:
+            try:
+                self.canvas_queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.canvas_queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def publish(self, canvas_dict):
+        '''发布画面(不阻塞)
+        canvas_dict: {窗口名称: 画布}, 画布为None的窗口不更新
+        返回值: 是否发布
+        '''
+        cur_t = time.time()
+        if cur_t - self.last_publish_t < 1.0 / self.fps:
+            return False
+        self.last_publish_t = cur_t
+        # 画布可能是图像处理中重复使用的缓存, 需要拷贝之后再放入队列
+        self.put_drop_oldest({win_name: np.copy(canvas) for win_name, canvas in canvas_dict.items() \
+            if canvas is not None})
+        return True
+
+    def get_key(self):
+        '''获取显示进程中最近一次的按键(读取之后清空), 没有按键返回-1'''
+        with self.key_value.get_lock():
+            key = self.key_value.value
+            self.key_value.value = -1
+        return key
+
+    def stop(self):
+        '''关闭显示进程'''
+        if self.process is None:
+            return
+        self.put_drop_oldest(None)
+        self.process.join(timeout=1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
@@ -0,0 +1,69 @@
+'''
+单帧图像金字塔
+同一帧图像会被巡线/交通锥/ArucoTag多个检测器使用,
+每个缩放比例的图像以及灰度图只在第一次用到的时候计算一次, 之后直接复用
+'''
+import cv2
+
+class FramePyramid:
+    '''单帧图像金字塔(惰性计算+缓存)'''
+    def __init__(self, img=None, img_scale=1.0, mjpeg_buf=None, decode_scale=1.0, cam=None):
+        '''
+        img: 已经解码的BGR图像
+        img_scale: img相对原图的缩放比例
+        mjpeg_buf: MJPEG原始数据(与img二选一), 第一次用到的时候才解码
+        decode_scale: MJPEG解码所需的最小缩放比例
+        cam: 相机对象, 负责MJPEG解码
+        '''
+        self._base = img
+        self._base_scale = img_scale
+        self.mjpeg_buf = mjpeg_buf
+        self.decode_scale = decode_scale
+        self.cam = cam
+        self.bgr_levels = {} # 各个缩放比例的彩图 {缩放比例: 图像}
+        self.gray_levels = {} # 各个缩放比例的灰度图 {缩放比例: 图像}
+
+    def decode(self):
+        '''MJPEG解码, 得到金字塔的底层图像'''
+        if self._base is None and self.mjpeg_buf is not None:
+            self._base, self._base_scale = self.cam.decode_mjpeg(self.mjpeg_buf, scale=self.decode_scale)
+        return self._base is not None
+
+    @property
+    def base(self):
+        '''金字塔底层(分辨率最高)的图像'''
+        self.decode()
+        return self._base
+
+    @property
+    def base_scale(self):
+        '''底层图像相对原图的缩放比例'''
+        self.decode()
+        return self._base_scale
+
+    def level_shape(self, scale):
+        '''缩放比例为scale(相对原图)的图像尺寸(h, w), 与cv2.resize的取整方式一致'''
+        fx = scale / self.base_scale
+        h, w = self.base.shape[:2]
+        return int(round(h * fx)), int(round(w * fx))
+
+    def resize(self, scale, dst=None):
+        '''获取缩放比例为scale(相对原图)的彩图
+        dst: 预先分配的图像缓存(尺寸为level_shape(scale)), 避免每一帧都申请内存
+        '''
+        if scale not in self.bgr_levels:
+            if scale == self.base_scale:
+                self.bgr_levels[scale] = self.base
+            else:
+                # 统一从底层图像缩放, 结果与直接对原图缩放保持一致
+                fx = scale / self.base_scale
+                self.bgr_levels[scale] = cv2.resize(self.base, dsize=None, fx=fx, fy=fx, dst=dst)
+        return self.bgr_levels[scale]
+
+    def gray(self, scale, dst=None):
+        '''获取缩放比例为scale(相对原图)的灰度图
+        dst: 预先分配的灰度图缓存
+        '''
+        if scale not in self.gray_levels:
+            self.gray_levels[scale] = cv2.cvtColor(self.resize(scale), cv2.COLOR_BGR2GRAY, dst=dst)
+        return self.gray_levels[scale]
@@ -0,0 +1,128 @@
+'''
+共享内存图像环形缓冲区
+采集进程把图像直接解码到共享内存的槽位中(零拷贝发布),
+多个图像处理进程(巡线/交通锥/ArucoTag)各自读取最新的一帧, 在树莓派的多个核上并行处理
+
+共享内存布局(int64对齐):
+    [全局头] latest_seq, n_slot, img_h, img_w, img_c
+    [槽位头] 每个槽位: version, frame_seq, timestamp_ns
+    [图像数据] n_slot x (img_h, img_w, img_c) uint8
+
+槽位头采用seqlock的方式进行同步:
+    写入前version加一变为奇数, 写入完成后version再加一变为偶数.
+    读取方在拷贝前后分别读取version, 两次一致且为偶数, 说明读到的图像是完整的.
+'''
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from multiprocessing import resource_tracker
+
+class FrameRing:
+    '''图像环形缓冲区'''
+    HEADER_LEN = 8 # 全局头的长度(int64个数)
+    SLOT_HEADER_LEN = 3 # 槽位头的长度(int64个数)
+
+    def __init__(self, shm, is_owner=False):
+        self.shm = shm
+        self.is_owner = is_owner # 创建者负责释放共享内存
+        self.header = np.ndarray((self.HEADER_LEN,), dtype=np.int64, buffer=shm.buf)
+        self.n_slot, img_h, img_w, img_c = [int(v) for v in self.header[1:5]]
+        self.shape = (img_h, img_w, img_c)
+        self.slot_header = np.ndarray((self.n_slot, self.SLOT_HEADER_LEN), dtype=np.int64, \
+            buffer=shm.buf, offset=self.HEADER_LEN*8)
+        self.slots = np.ndarray((self.n_slot,) + self.shape, dtype=np.uint8, buffer=shm.buf, \
+            offset=self.data_offset(self.n_slot))
+        self.write_idx = None # 正在写入的槽位
+
+    @classmethod
+    def data_offset(cls, n_slot):
+        '''图像数据的起始偏移量(按64字节对齐)'''
+        offset = (cls.HEADER_LEN + n_slot * cls.SLOT_HEADER_LEN) * 8
+        return (offset + 63) // 64 * 64
+
+    @classmethod
+    def create(cls, name, shape, n_slot=4):
+        '''创建环形缓冲区'''
+        size = cls.data_offset(n_slot) + n_slot * int(np.prod(shape))
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((cls.HEADER_LEN,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[1:5] = (n_slot,) + tuple(shape)
+        slot_header = np.ndarray((n_slot, cls.SLOT_HEADER_LEN), dtype=np.int64, \
+            buffer=shm.buf, offset=cls.HEADER_LEN*8)
+        slot_header[:] = 0
+        return cls(shm, is_owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        '''连接已经创建好的环形缓冲区'''
+        shm = shared_memory.SharedMemory(name=name)
+        # 共享内存由创建者负责释放, 避免资源追踪进程在读取方退出时误删
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls(shm)
+
+    @property
+    def latest_seq(self):
+        '''最新一帧的序号'''
+        return int(self.header[0])
+
+    def begin_write(self):
+        '''获取下一个可写入的槽位, 图像可以直接解码到返回的数组中'''
+        self.write_idx = (self.latest_seq + 1) % self.n_slot
+        self.slot_header[self.write_idx, 0] += 1 # version变为奇数, 标记为正在写入
+        return self.slots[self.write_idx]
+
+    def end_write(self, timestamp=None):
+        '''完成写入并发布
+        timestamp为None代表写入失败, 槽位作废, 不发布
+        '''
+        idx = self.write_idx
+        if timestamp is None:
+            self.slot_header[idx, 1] = -1
+        else:
+            self.slot_header[idx, 1] = self.latest_seq + 1
+            self.slot_header[idx, 2] = int(timestamp * 1e9)
+        self.slot_header[idx, 0] += 1 # version变为偶数, 写入完成
+        if timestamp is not None:
+            self.header[0] = self.slot_header[idx, 1]
+        self.write_idx = None
+
+    def publish(self, img, timestamp):
+        '''拷贝一帧图像到缓冲区并发布'''
+        np.copyto(self.begin_write(), img)
+        self.end_write(timestamp)
+
+    def read(self, last_seq=0, dst=None, timeout=1.0):
+        '''读取最新的一帧
+        会一直等待, 直到出现序号比last_seq更新的图像
+        dst: 预先分配的图像缓存, 避免每一帧都申请内存
+        返回值: ret, img, timestamp, seq
+        '''
+        if dst is None:
+            dst = np.empty(self.shape, dtype=np.uint8)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            seq = self.latest_seq
+            if seq <= last_seq:
+                time.sleep(0.001)
+                continue
+            idx = seq % self.n_slot
+            version = self.slot_header[idx, 0]
+            if version % 2 == 1:
+                # 写入进程正在拷贝这个槽位, 稍后重试
+                time.sleep(0.001)
+                continue
+            np.copyto(dst, self.slots[idx])
+            timestamp = self.slot_header[idx, 2] / 1e9
+            # 校验拷贝期间槽位没有被改写
+            if self.slot_header[idx, 0] == version and self.slot_header[idx, 1] == seq:
+                return True, dst, timestamp, seq
+        return False, None, None, last_seq
+
+    def close(self):
+        '''断开与共享内存的连接, 创建者同时释放共享内存'''
+        # 先释放numpy视图, 否则共享内存无法关闭
+        self.header = self.slot_header = self.slots = None
+        self.shm.close()
+        if self.is_owner:
+            self.shm.unlink()
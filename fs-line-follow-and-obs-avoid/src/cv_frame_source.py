@@ -0,0 +1,62 @@
+'''
+后台图像采集线程
+采集线程持续从相机中读取图像, 只保留最新的一帧,
+图像处理始终拿到最新的画面, 同时采集与图像处理可以并行
+'''
+import time
+import threading
+import logging
+
+class FrameSource:
+    '''最新帧语义的图像源'''
+    def __init__(self, cam, raw_mjpeg=False):
+        self.cam = cam
+        # 创建Capture对象
+        # raw_mjpeg为True时, 读取到的是MJPEG原始数据, 需要通过cam.decode_mjpeg解码
+        self.capture = cam.get_video_capture(raw_mjpeg=raw_mjpeg)
+        # 条件变量, 有新的图像时通知读取方
+        self.cond = threading.Condition()
+        self.frame = None # 最新的一帧图像
+        self.timestamp = 0 # 最新一帧的采集时间
+        self.seq = 0 # 最新一帧的序号(从1开始)
+        self.is_running = False
+        self.thread = None
+
+    def start(self):
+        '''开启采集线程'''
+        self.is_running = True
+        self.thread = threading.Thread(target=self.grab_loop, daemon=True)
+        self.thread.start()
+        return self
+
+    def grab_loop(self):
+        '''采集线程: 持续解码, 覆盖旧的图像'''
+        while self.is_running:
+            ret, img = self.capture.read()
+            timestamp = time.time()
+            if not ret:
+                logging.error('[FrameSource] 图像获取失败')
+                time.sleep(0.01)
+                continue
+            with self.cond:
+                self.frame = img
+                self.timestamp = timestamp
+                self.seq += 1
+                self.cond.notify_all()
+
+    def read(self, last_seq=0, timeout=1.0):
+        '''获取最新的一帧
+        会一直等待, 直到出现序号比last_seq更新的图像
+        返回值: ret, img, timestamp, seq
+        '''
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq > last_seq, timeout=timeout):
+                return False, None, None, last_seq
+            return True, self.frame, self.timestamp, self.seq
+
+    def release(self):
+        '''停止采集线程, 关闭摄像头'''
+        self.is_running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+        self.capture.release()
@@ -0,0 +1,94 @@
+'''
+图像处理各个阶段的耗时统计
+每一帧各个阶段的开始时间与耗时(time.perf_counter_ns)记录在预先分配的环形缓冲区中,
+可以随时统计最近若干帧各个阶段耗时的P50/P95/P99, 也可以导出为Chrome Trace格式的JSON文件,
+在 chrome://tracing 或者 https://ui.perfetto.dev 中查看
+'''
+import os
+import json
+import time
+import logging
+import numpy as np
+
+# 主循环中图像处理的各个阶段
+CV_STAGES = ('capture', 'preprocess', 'ipm', 'fit', 'cone', 'aruco', 'display')
+
+class StageTimer:
+    '''分阶段耗时统计'''
+    def __init__(self, stages=CV_STAGES, capacity=1024, name='CV', log_interval=0):
+        '''
+        stages: 阶段名称的列表
+        capacity: 环形缓冲区能够保存的帧数
+        name: 名称(日志以及Chrome Trace中的线程名)
+        log_interval: 每隔多少帧输出一次耗时统计, 为0时不自动输出
+        '''
+        self.stages = list(stages)
+        self.stage_idx = {stage: i for i, stage in enumerate(self.stages)}
+        self.capacity = capacity
+        self.name = name
+        self.log_interval = log_interval
+        # 每一帧各个阶段的开始时间与耗时(纳秒), 耗时为-1代表该阶段没有执行
+        self.start_ns = np.zeros((capacity, len(self.stages)), dtype=np.int64)
+        self.dur_ns = np.full((capacity, len(self.stages)), -1, dtype=np.int64)
+        self.frame_cnt = 0 # 已经开始的帧数
+        self.row = -1 # 当前帧在缓冲区中的行号
+
+    def new_frame(self):
+        '''开始新的一帧'''
+        if self.log_interval > 0 and self.frame_cnt > 0 and self.frame_cnt % self.log_interval == 0:
+            self.log_report()
+        self.row = self.frame_cnt % self.capacity
+        self.dur_ns[self.row] = -1
+        self.frame_cnt += 1
+
+    def start(self, stage):
+        '''阶段开始计时'''
+        self.start_ns[self.row, self.stage_idx[stage]] = time.perf_counter_ns()
+
+    def stop(self, stage):
+        '''阶段停止计时'''
+        col = self.stage_idx[stage]
+        self.dur_ns[self.row, col] = time.perf_counter_ns() - self.start_ns[self.row, col]
+
+    def valid_rows(self):
+        '''缓冲区中已经写入的行'''
+        return min(self.frame_cnt, self.capacity)
+
+    def report(self):
+        '''统计最近若干帧各个阶段的耗时
+        返回值: {阶段名称: (执行次数, P50, P95, P99)}, 耗时的单位为ms
+        '''
+        n_row = self.valid_rows()
+        stat = {}
+        for col, stage in enumerate(self.stages):
+            dur = self.dur_ns[:n_row, col]
+            dur = dur[dur >= 0]
+            if len(dur) == 0:
+                continue
+            p50, p95, p99 = np.percentile(dur, [50, 95, 99]) / 1e6
+            stat[stage] = (len(dur), p50, p95, p99)
+        return stat
+
+    def log_report(self):
+        '''输出各个阶段的耗时统计'''
+        for stage, (n, p50, p95, p99) in self.report().items():
+            logging.info('[{} Timing] {:<10s} n={:<5d} P50: {:.2f}ms P95: {:.2f}ms P99: {:.2f}ms'.format( \
+                self.name, stage, n, p50, p95, p99))
+
+    def trace_events(self):
+        '''转换为Chrome Trace的事件列表(按照时间排序)'''
+        pid = os.getpid()
+        n_row = self.valid_rows()
+        rows, cols = np.nonzero(self.dur_ns[:n_row] >= 0)
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': pid, 'args': {'name': self.name}}]
+        for row, col in sorted(zip(rows, cols), key=lambda rc: self.start_ns[rc[0], rc[1]]):
+            # 时间单位为us, perf_counter_ns在Linux上是系统范围的单调时钟, 多个进程的时间轴可以对齐
+            events.append({'name': self.stages[col], 'ph': 'X', 'pid': pid, 'tid': pid, \
+                'ts': int(self.start_ns[row, col]) / 1000, 'dur': int(self.dur_ns[row, col]) / 1000})
+        return events
+
+    def export_chrome_trace(self, file_path):
+        '''导出为Chrome Trace格式的JSON文件'''
+        with open(file_path, 'w') as f:
+            json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, f)
+        logging.info('[{} Timing] Chrome Trace保存在 {}'.format(self.name, file_path))
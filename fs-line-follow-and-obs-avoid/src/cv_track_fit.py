@@ -13,19 +13,163 @@ import numpy as np
 import matplotlib
 from matplotlib import pyplot as plt
 from cv_camera import Camera
+from cv_frame_pyramid import FramePyramid
 import logging
 import gc
 from config import *
 
+class PointIndex:
+    '''机器人坐标系下点云的索引
+    每一帧在curve_fit中只构建一次, 分别按x坐标与y坐标排序,
+    曲线1/曲线2的滑动窗口以及曲线1尾巴的ROI统计, 都通过二分查找只访问窗口附近的点
+    '''
+    # 二分查找窗口边界时额外放宽的范围, 抵消float32的舍入误差
+    # 候选点最终仍然按照原有的判断条件进行筛选
+    SEARCH_EPS = 1e-3
+    def __init__(self, rb_x, rb_y):
+        self.rb_x = rb_x
+        self.rb_y = rb_y
+        # 按照x坐标从小到大排序(稳定排序)
+        self.x_order = np.argsort(rb_x, kind='stable')
+        self.x_sorted = rb_x[self.x_order]
+        self.y_by_x = rb_y[self.x_order]
+        # 按照y坐标从小到大排序(稳定排序)
+        self.y_order = np.argsort(rb_y, kind='stable')
+        self.y_sorted = rb_y[self.y_order]
+        self.x_by_y = rb_x[self.y_order]
+
+    @staticmethod
+    def unique(arr_sorted):
+        '''有序数组去重'''
+        if len(arr_sorted) == 0:
+            return arr_sorted
+        return arr_sorted[np.concatenate(([True], arr_sorted[1:] != arr_sorted[:-1]))]
+
+    @classmethod
+    def search(cls, arr_sorted, v_center, v_half):
+        '''查找落在(v_center-v_half, v_center+v_half)范围内的点在有序数组中的范围 [lo, hi)
+        v_center可以是数组, 返回的范围为候选点(略大于实际范围)
+        '''
+        v_center = np.float64(v_center)
+        lo = np.searchsorted(arr_sorted, v_center - (v_half + cls.SEARCH_EPS), side='left')
+        hi = np.searchsorted(arr_sorted, v_center + (v_half + cls.SEARCH_EPS), side='right')
+        return lo, hi
+
+class QuadFit:
+    '''二次曲线 y = a*x^2 + b*x + c 的加权最小二乘拟合
+    在滑动窗口采样的过程中逐点累加正规方程(normal equation)中的各项和,
+    采样结束之后直接求解3x3的线性方程组(闭式解), 不再调用np.polyfit
+    '''
+    # 正规方程矩阵归一化之后行列式的下限
+    # 小于这个值认为二次项病态(例如只有两个样本点), 退化为直线拟合
+    DET_MIN = 1e-6
+    def __init__(self):
+        # 坐标平移量, 以第一个点的x坐标为原点累加, 提高数值稳定性
+        self.x0 = None
+        # sum(w*x^i) i=0,1,2,3,4
+        self.s0, self.s1, self.s2, self.s3, self.s4 = 0.0, 0.0, 0.0, 0.0, 0.0
+        # sum(w*x^i*y) i=0,1,2
+        self.t0, self.t1, self.t2 = 0.0, 0.0, 0.0
+
+    @classmethod
+    def fit(cls, x_arr, y_arr, w_arr=None):
+        '''一次性拟合所有的点, 返回值同solve'''
+        quad_fit = cls()
+        quad_fit.add_points(x_arr, y_arr, w_arr)
+        return quad_fit.solve()
+
+    def add_points(self, x_arr, y_arr, w_arr=None):
+        '''批量添加样本点'''
+        if len(x_arr) == 0:
+            return
+        if self.x0 is None:
+            self.x0 = float(x_arr[0])
+        x = np.asarray(x_arr, dtype=np.float64) - self.x0
+        # 各项放在同一个矩阵中, 只求和一次(小数组上numpy调用本身的开销占大头)
+        # 行: w, w*x, w*x^2, w*x^3, w*x^4, w*y, w*x*y, w*x^2*y
+        terms = np.empty((8, len(x)))
+        terms[0] = 1.0 if w_arr is None else w_arr
+        for i in range(1, 5):
+            np.multiply(terms[i-1], x, out=terms[i])
+        np.multiply(terms[0:3], y_arr, out=terms[5:8])
+        s0, s1, s2, s3, s4, t0, t1, t2 = terms.sum(axis=1).tolist()
+        self.s0 += s0
+        self.s1 += s1
+        self.s2 += s2
+        self.s3 += s3
+        self.s4 += s4
+        self.t0 += t0
+        self.t1 += t1
+        self.t2 += t2
+
+    def add(self, x, y, w=1.0):
+        '''添加一个样本点(权重为w)'''
+        if self.x0 is None:
+            self.x0 = float(x)
+        x = float(x) - self.x0
+        y = float(y)
+        wx = w * x
+        wx2 = wx * x
+        self.s0 += w
+        self.s1 += wx
+        self.s2 += wx2
+        self.s3 += wx2 * x
+        self.s4 += wx2 * x * x
+        self.t0 += w * y
+        self.t1 += wx * y
+        self.t2 += wx2 * y
+
+    def solve(self):
+        '''求解曲线的系数
+        返回值: a, b, c, is_ok
+        is_ok为False代表二次项病态, 此时退化为直线拟合(a=0), 直线也无法拟合时退化为常数
+        '''
+        s0, s1, s2, s3, s4 = self.s0, self.s1, self.s2, self.s3, self.s4
+        t0, t1, t2 = self.t0, self.t1, self.t2
+        # 正规方程: [[s4 s3 s2] [s3 s2 s1] [s2 s1 s0]] * [a b c]^T = [t2 t1 t0]^T
+        # 克莱姆法则求解
+        m00 = s2*s0 - s1*s1
+        m01 = s3*s0 - s1*s2
+        m02 = s3*s1 - s2*s2
+        det = s4*m00 - s3*m01 + s2*m02
+        # 对称正定矩阵的行列式不大于对角线元素的乘积, 以此归一化
+        diag = s4 * s2 * s0
+        is_ok = diag > 0 and det > self.DET_MIN * diag
+        if is_ok:
+            a = (t2*m00 - s3*(t1*s0 - s1*t0) + s2*(t1*s1 - s2*t0)) / det
+            b = (s4*(t1*s0 - s1*t0) - t2*m01 + s2*(s3*t0 - t1*s2)) / det
+            c = (s4*(s2*t0 - t1*s1) - s3*(s3*t0 - t1*s2) + t2*m02) / det
+        elif s0 > 0 and m00 > self.DET_MIN * s2 * s0:
+            # 直线拟合
+            a = 0.0
+            b = (s0*t1 - s1*t0) / m00
+            c = (s2*t0 - s1*t1) / m00
+        else:
+            a, b = 0.0, 0.0
+            c = t0 / s0 if s0 > 0 else 0.0
+        # 平移回原来的坐标系
+        x0 = self.x0 if self.x0 is not None else 0.0
+        return a, b - 2*a*x0, a*x0*x0 - b*x0 + c, is_ok
+
 class TrackFit:
     '''赛道曲线拟合'''
     # 图像缩放因子
     IMG_SCALE_FACTOR = 0.05
     # IMG_SCALE_FACTOR = 0.1
+    # MJPEG缩小比例解码时, 图像的最小缩放比例
+    # 1/8解码相当于8x8的均值滤波, 远处的细黑线会被背景平均掉, 因此最多只缩小到1/4
+    DECODE_SCALE = 0.25
     # 赛道颜色阈值(白底+黑线 两个阈值的并集)
     # 这个阈值的作用是防止除了赛道之外的颜色干扰, 例如地毯, 地板等
     # 色块的最小连通区域面积(针对32x24的缩略图)
-    MIN_CNT_AREA = 10 # 25 # 最小的连通区域的面积(针对缩放之后的图像)
+    MIN_CNT_AREA = 10 # 25 # 最小的连通区域的面积(外轮廓的contourArea, 针对缩放之后的图像)
+    # 连通域按像素个数N筛选, 与外轮廓面积A的对应关系(见filter_components):
+    # 空洞填充之后, 由Pick定理 A = N - B/2 - 1 (B为轮廓上的像素个数, 1 <= B <= N)
+    # N <= MIN_CNT_AREA+1 时必然 A <= MIN_CNT_AREA, N > 2*(MIN_CNT_AREA+1) 时必然 A > MIN_CNT_AREA
+    # 中间的区间内单独计算外轮廓面积
+    MIN_CC_AREA = 2 * (MIN_CNT_AREA + 1) # 像素个数大于该值的连通域直接保留
+    # 二值化图像膨胀的卷积核
+    DILATE_KERNEL = np.ones((3,3), np.uint8)
     # 机器人坐标系下点的取值范围
     # 机器人只关注这个范围下的点
     RB_Y_MIN = -30
@@ -64,15 +208,44 @@ class TrackFit:
                     # Matplotlib绘图质量好但是帧率差
 
     LANE_MID2EDGE = 25 # 中线距离边界线的距离 25cm
+    # 跟踪模式
+    # 根据上一帧的曲线与机器人的运动(前进距离+IMU偏航角)预测当前帧的曲线1,
+    # 只在预测曲线附近的带状区域内采样, 不满足条件时退回全局搜索
+    TRACK_BAND = 4 # 带状区域的半宽(y方向, 单位cm)
+    TRACK_MIN_PT = 5 # 带状区域内点的最小个数
+    TRACK_MAX_RESIDUAL = 1.5 # 拟合残差(均方根, 单位cm)的上限
+    # 多分辨率细化
+    # 在缩略图拟合得到的曲线1两侧的带状区域内, 用更高分辨率的灰度图重新定位直线的中心
+    REFINE_SCALE = 0.25 # 细化使用的灰度图的缩放比例, 为None时不细化
+    REFINE_X_STEP = 1.0 # 沿x轴的采样间隔(cm)
+    REFINE_BAND = 4.0 # 带状区域的半宽(y方向, 单位cm)
+    REFINE_Y_STEP = 0.25 # 带状区域内y方向的采样间隔(cm)
+    REFINE_MIN_CONTRAST = 40 # 采样线上灰度的最大值与最小值之差的下限
 
     def __init__(self, cam):
         self.cam = cam
-        # 载入摄像头的标定数据
-        cam.load_cam_calib_data()
+        # 载入摄像头的标定数据(已经载入过的话就不再重复载入)
+        if cam.intrinsic is None:
+            cam.load_cam_calib_data()
         # 设置绘图引擎
         self.set_painter()
         self.pt_near2org = (self.RB_X_MIN, 0)
         self.last_y_offset = 0
+        # 缩放图像尺寸下的IPM查找表(第一次用到的时候生成)
+        self.ipm_lut = None
+        # 跟踪模式: 上一帧曲线1的系数(a, b, c)以及对应的里程信息
+        self.track_coeff = None
+        self.track_odom = None
+        self.is_tracking = False # 当前帧是否由跟踪模式得到曲线1
+        # 图像预处理的缓存, 每一帧重复使用 {名称: 数组}
+        self.bufs = {}
+        # 圆点图章的一维像素偏移量 {(半径, 画布宽度): 偏移量}
+        self.point_stamps = {}
+        # 机器人坐标系画布的模板(白底+坐标系), 第一次绘制的时候生成
+        self.canvas_tpl = None
+        # 上一帧合法连通域的统计信息
+        self.cc_stats = np.zeros((0, 5), dtype=np.int32) # (x, y, w, h, 面积)
+        self.cc_centroids = np.zeros((0, 2)) # 质心(x, y)
 
     def set_painter(self):
         if self.PAINTER == 'MATPLOTLIB':
@@ -85,6 +258,66 @@ class TrackFit:
             plt.figure(figsize=(8, 6))
             self.fig, self.axes = plt.subplots()
         
+    def get_buf(self, name, shape, dtype=np.uint8):
+        '''获取预先分配的缓存, 尺寸变化时重新分配'''
+        buf = self.bufs.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = self.bufs[name] = np.empty(shape, dtype=dtype)
+        return buf
+
+    def draw_points(self, canvas, px, py, radius, color):
+        '''批量绘制实心圆点
+        预先用cv2.circle生成圆点的图章(按画布宽度换算成一维的像素偏移量),
+        所有圆点的像素通过一次花式索引写入画布, 效果与逐个调用cv2.circle一致
+        注: 圆心限制在[radius, 宽/高-1-radius]的范围内, 画布边缘的圆点整体移入画布
+        '''
+        h, w = canvas.shape[:2]
+        key = (radius, w)
+        if key not in self.point_stamps:
+            stamp = np.zeros((2*radius+1, 2*radius+1), dtype=np.uint8)
+            cv2.circle(stamp, (radius, radius), radius, color=1, thickness=-1)
+            dy, dx = stamp.nonzero()
+            self.point_stamps[key] = np.int32((dy - radius) * w + (dx - radius))
+        offsets = self.point_stamps[key]
+        n = len(px)
+        # 圆心在画布上的一维索引
+        cx = self.get_buf('draw_cx', (n,), np.int32)
+        cy = self.get_buf('draw_cy', (n,), np.int32)
+        np.maximum(px, radius, out=cx, casting='unsafe')
+        np.minimum(cx, w - 1 - radius, out=cx)
+        np.maximum(py, radius, out=cy, casting='unsafe')
+        np.minimum(cy, h - 1 - radius, out=cy)
+        cy *= w
+        cy += cx
+        idx = self.get_buf('draw_idx', (n, len(offsets)), np.int32)
+        np.add(cy.reshape(-1, 1), offsets, out=idx)
+        # 每个像素的所有通道视为一个整体(void类型), 一次写入整个像素
+        n_ch = canvas.shape[2]
+        pixels = canvas.reshape(-1, n_ch).view('V{}'.format(n_ch)).reshape(-1)
+        pixels[idx.ravel()] = np.uint8(color).view('V{}'.format(n_ch))[0]
+        return canvas
+
+    def get_canvas(self, scale=10):
+        '''获取机器人坐标系的画布
+        白底与坐标系只在第一次绘制, 之后每一帧从模板拷贝到预先分配的画布上
+        注: 返回的画布下一帧会被覆盖
+        '''
+        if self.canvas_tpl is None:
+            # 创建一个空白地图
+            canvas = np.full((60*scale, 80*scale, 3), 255, dtype=np.uint8)
+            # 绘制坐标系
+            x0, y0 = self.rb2pixel(0, 0)
+            x1, y1 = self.rb2pixel(4, 0)
+            x2, y2 = self.rb2pixel(0, 4)
+            # 绘制x轴
+            cv2.line(canvas, (x0, y0), (x1, y1), thickness=6, color=(0, 0, 255))
+            # 绘制y轴
+            cv2.line(canvas, (x0, y0), (x2, y2), thickness=6, color=(0, 255, 0))
+            self.canvas_tpl = canvas
+        canvas = self.get_buf('canvas_robo', self.canvas_tpl.shape)
+        np.copyto(canvas, self.canvas_tpl)
+        return canvas
+
     def find_contours(self, img_bin):
         ''' 寻找连通域(兼容不同的CV版本)'''
         if cv2.__version__[0] == '4':
@@ -93,92 +326,163 @@ class TrackFit:
             img, contours, hierarchy =  cv2.findContours(img_bin, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         return contours
 
-    def img_preprocess(self, img):
-        '''图像预处理'''
+    def fill_holes(self, bin_line):
+        '''填充连通域内部的空洞
+        图像四周补一圈背景, 从角点漫水填充(4连通)外部的背景, 没有被填充到的背景即为空洞,
+        与drawContours实心绘制外轮廓的结果一致
+        '''
+        h, w = bin_line.shape
+        bin_pad = cv2.copyMakeBorder(bin_line, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0, \
+            dst=self.get_buf('bin_pad', (h + 2, w + 2)))
+        cv2.floodFill(bin_pad, None, (0, 0), 255)
+        # 空洞 = 没有被填充的背景, 与原图取并集
+        bin_fill = cv2.bitwise_not(bin_pad[1:-1, 1:-1], dst=self.get_buf('bin_fill', bin_line.shape))
+        return cv2.bitwise_or(bin_fill, bin_line, dst=bin_fill)
+
+    def filter_components(self, bin_line):
+        '''过滤掉面积较小的连通域
+        等价于原来的findContours(外轮廓) + contourArea > MIN_CNT_AREA + drawContours实心绘制:
+        先填充空洞, 一次连通域标记得到所有连通域的统计信息(外接矩形, 面积, 质心),
+        按像素个数向量化筛选, 只有像素个数落在(MIN_CNT_AREA+1, MIN_CC_AREA]区间内的连通域
+        在外接矩形内单独计算外轮廓面积, 再通过标签查找表生成过滤之后的二值化图像
+        注: Pick定理的下界要求连通域没有单像素宽的部分, img_preprocess中3x3膨胀之后的图像满足
+        返回值: 合法连通域的个数, 过滤之后的二值化图像
+        '''
+        bin_line = self.fill_holes(bin_line)
+        cc_num, cc_labels, cc_stats, cc_centroids = cv2.connectedComponentsWithStats(bin_line, \
+            labels=self.get_buf('cc_labels', bin_line.shape, np.int32), connectivity=8, ltype=cv2.CV_32S)
+        # 筛选面积大于阈值的连通域(标签0为背景)
+        cc_area = cc_stats[:, cv2.CC_STAT_AREA]
+        is_valid = cc_area > self.MIN_CC_AREA
+        is_valid[0] = False
+        for label, area in enumerate(cc_area.tolist()):
+            if label == 0 or area <= self.MIN_CNT_AREA + 1 or area > self.MIN_CC_AREA:
+                continue
+            x, y, w, h = cc_stats[label, :4]
+            cc_roi = np.uint8(cc_labels[y:y+h, x:x+w] == label)
+            cnts = self.find_contours(cc_roi)
+            is_valid[label] = cv2.contourArea(cnts[0]) > self.MIN_CNT_AREA
+        valid_num = np.count_nonzero(is_valid)
+        if valid_num < cc_num - 1:
+            # 存在需要过滤掉的连通域
+            cc_lut = np.multiply(is_valid, 255, dtype=np.uint8)
+            bin_line = np.take(cc_lut, cc_labels, out=self.get_buf('bin_line', bin_line.shape))
+        # 保存合法连通域的统计信息, 供后续的处理复用
+        # cc_stats: (x, y, w, h, 面积), cc_centroids: (x, y), 均为缩放之后(整幅)图像的坐标
+        self.cc_stats = cc_stats[is_valid]
+        self.cc_centroids = cc_centroids[is_valid]
+        return valid_num, bin_line
+
+    def img_preprocess(self, img, img_scale=1.0):
+        '''图像预处理
+        img: 输入图像, 也可以是多个检测器共享的图像金字塔FramePyramid
+        img_scale: 输入图像相对原图的缩放比例(例如MJPEG缩小比例解码得到的图像)
+        注: 返回的二值化图像是预先分配的缓存, 下一帧会被覆盖
+        '''
+        frame = img if isinstance(img, FramePyramid) else FramePyramid(img, img_scale)
         # 将彩图缩放为小图
-        img_small_bgr = cv2.resize(img, dsize=None, fx=self.IMG_SCALE_FACTOR, fy=self.IMG_SCALE_FACTOR)
+        img_small_size = frame.level_shape(self.IMG_SCALE_FACTOR)
+        img_small_bgr = frame.resize(self.IMG_SCALE_FACTOR, dst=self.get_buf('img_small', img_small_size + (3,)))
         # 根据赛道黑线的BGR阈值,进行图像预处理
-        bin_line = cv2.inRange(img_small_bgr, lowerb=TRACK_BLACK_LOERB, upperb=TRACK_BLACK_UPPERB)
+        bin_line = cv2.inRange(img_small_bgr, lowerb=TRACK_BLACK_LOERB, upperb=TRACK_BLACK_UPPERB, \
+            dst=self.get_buf('bin_black', img_small_size))
         # 对二值化图像进行膨胀
-        bin_line = cv2.dilate(bin_line, np.ones((3,3), np.uint8), iterations=1)
+        bin_line = cv2.dilate(bin_line, self.DILATE_KERNEL, dst=self.get_buf('bin_dilate', img_small_size), iterations=1)
         # 彩图转换为灰度图
-        gray_small = cv2.cvtColor(img_small_bgr, cv2.COLOR_BGR2GRAY)
+        gray_small = frame.gray(self.IMG_SCALE_FACTOR, dst=self.get_buf('gray_small', img_small_size))
 
         # 通过像素统计判断是否存在直线
-        blk_pt_n = np.sum(gray_small < self.LINE_GRAY_MAX)
+        # 灰度值小于LINE_GRAY_MAX的像素置为255(反向二值化)
+        bin_dark = cv2.threshold(gray_small, self.LINE_GRAY_MAX - 1, 255, cv2.THRESH_BINARY_INV, \
+            dst=self.get_buf('bin_dark', img_small_size))[1]
+        blk_pt_n = cv2.countNonZero(bin_dark)
         if blk_pt_n < self.LINE_PIXEL_N_MIN:
+            self.cc_stats = self.cc_stats[:0]
+            self.cc_centroids = self.cc_centroids[:0]
             return False, bin_line
 
         # 过滤掉较小的连通区域
-        line_cnts = self.find_contours(bin_line) # 寻找连通域
-        valid_cnt_num = 0
-        if len(line_cnts) >= 1:
-            # 筛选面积大于阈值的连通域
-            bin_line = np.zeros_like(bin_line)
-            for cnt in line_cnts:
-                if cv2.contourArea(cnt) > self.MIN_CNT_AREA:
-                    valid_cnt_num += 1
-                    bin_line = cv2.drawContours(image=bin_line, contours=[cnt], contourIdx=0, color=255, thickness=-1)
-        
+        valid_num, bin_line = self.filter_components(bin_line)
         # 判断画面中是否有直线的区域
-        has_line = valid_cnt_num >= 1
+        has_line = valid_num >= 1
         
         return has_line, bin_line
     
+    def get_ipm_lut(self, shape):
+        '''获取缩放图像尺寸下的IPM查找表
+        查找表中每个像素直接对应机器人坐标系下的(x, y),
+        同时预先计算好每个像素是否落在机器人坐标系的ROI内
+        返回值: lut_x, lut_y, roi_mask, px, py (px, py为小图像素坐标映射回原图的坐标)
+        '''
+        if self.ipm_lut is None or self.ipm_lut[0] != shape:
+            h, w = shape
+            # 像素重新映射回(640x480)
+            px = np.uint16(np.arange(w) / self.IMG_SCALE_FACTOR)
+            py = np.uint16(np.arange(h) / self.IMG_SCALE_FACTOR)
+            lut_x, lut_y = self.cam.inverse_projection_mapping2_batch(px[None, :], py[:, None])
+            # 只选取在机器人坐标系ROI内的点
+            roi_mask = np.bitwise_and(
+                np.bitwise_and(lut_y > self.RB_Y_MIN, lut_y < self.RB_Y_MAX),
+                np.bitwise_and(lut_x > self.RB_X_MIN, lut_x < self.RB_X_MAX))
+            self.ipm_lut = (shape, lut_x, lut_y, roi_mask, px, py)
+        return self.ipm_lut[1:]
+
     def pixel_ipm(self, bin_line, canvas=None):
         '''
         将缩放后的直线二值化图像中的像素点透视逆变换, 转换到机器人坐标系上
         '''
-        # 获取图像中的非零点的坐标
-        n0_y, n0_x = bin_line.nonzero()
-        # 像素重新映射回(640x480)
-        n0_x = np.uint16(n0_x / self.IMG_SCALE_FACTOR)
-        n0_y = np.uint16(n0_y / self.IMG_SCALE_FACTOR)
+        lut_x, lut_y, roi_mask, px, py = self.get_ipm_lut(bin_line.shape)
         # 可视化 在原图上标注上采样点
         if canvas is not None:
+            # 获取图像中的非零点的坐标
+            n0_y, n0_x = bin_line.nonzero()
             # 为了可视化要绘制圆圈
-            for i in range(len(n0_x)):
-                cx, cy = n0_x[i], n0_y[i]
-                cv2.circle(canvas, (cx, cy), 5, thickness=-1, color=(0, 255, 255))
-        # 像素点的个数
-        n_pt = len(n0_x)
-        # 将非零点,投影到机器人基坐标系下
-        rb_x = np.zeros(n_pt, dtype=np.float32)
-        rb_y = np.zeros(n_pt, dtype=np.float32)
-        for i in range(n_pt):
-            # 透视逆变换
-            rb_x[i], rb_y[i] = self.cam.inverse_projection_mapping2(n0_x[i], n0_y[i])
-        # 只选取在机器人坐标系ROI内的点
-        legal_pt_idxs = np.bitwise_and(
-            np.bitwise_and(rb_y > self.RB_Y_MIN, rb_y < self.RB_Y_MAX),
-            np.bitwise_and(rb_x > self.RB_X_MIN, rb_y < self.RB_X_MAX))
-        rb_x = rb_x[legal_pt_idxs]
-        rb_y = rb_y[legal_pt_idxs]
+            self.draw_points(canvas, px[n0_x], py[n0_y], 5, (0, 255, 255))
+        # 查表完成透视逆变换, 只保留ROI内的非零点
+        legal_pt_mask = np.greater(bin_line, 0, out=self.get_buf('legal_pt_mask', bin_line.shape, np.bool_))
+        legal_pt_mask = np.bitwise_and(legal_pt_mask, roi_mask, out=legal_pt_mask)
+        rb_x = lut_x[legal_pt_mask]
+        rb_y = lut_y[legal_pt_mask]
 
         return rb_x, rb_y
 
-    def c1_pt_sample(self, rb_x, rb_y):
-        '''曲线1通过滑动窗口(x方向)进行采样'''
+    def c1_pt_sample(self, rb_x, rb_y, pt_index=None, quad_fit=None):
+        '''曲线1通过滑动窗口(x方向)进行采样
+        所有的点只按x坐标排序一次, 每个滑动窗口通过二分查找(np.searchsorted)
+        定位x方向上的候选点, 不再每一步都遍历全部的点
+        pt_index: 点云索引PointIndex, 为None时现场构建
+        quad_fit: 二次曲线拟合器QuadFit, 采样点会同步累加到拟合器中 (y = f(x))
+        '''
+        if pt_index is None:
+            pt_index = PointIndex(rb_x, rb_y)
+        if quad_fit is None:
+            quad_fit = QuadFit()
+        x_order, x_sorted, y_by_x = pt_index.x_order, pt_index.x_sorted, pt_index.y_by_x
         # 对x轴的数值进行筛选
-        rb_x_unique = np.array(list(set(rb_x)))
-        # 从小到大进行排序
-        rb_x_unique = np.sort(rb_x_unique)
-        # print('rb_x_unique: {}'.format(rb_x_unique))
+        rb_x_unique = PointIndex.unique(x_sorted)
+        # 每个滑动窗口在x方向上的候选点的范围 [win_lo, win_hi)
+        win_lo, win_hi = PointIndex.search(x_sorted, rb_x_unique, self.WIN_H/2)
         # 采样框的记录 
         # sld_win: sliding window
         sld_win_hist = []
         # 记录样本点是否被采样过
-        is_pt_visited = np.zeros_like(rb_x, dtype=np.bool)
+        is_pt_visited = np.zeros_like(rb_x, dtype=bool)
+        visited_idx_list = []
         # 曲线的采样点的集合
         curve_x = []
         curve_y = []
         # 确定采样点的起始位置
         root_x = rb_x_unique[0] # 找到x的最小值
-        root_y = np.mean(rb_y[np.abs(rb_x-root_x) < 1]) # 对root_x上的点的y轴求平均值
+        # 对root_x上的点的y轴求平均值
+        root_lo, root_hi = PointIndex.search(x_sorted, root_x, 1)
+        cand_idx = x_order[root_lo:root_hi]
+        root_idx = np.sort(cand_idx[np.abs(rb_x[cand_idx]-root_x) < 1])
+        root_y = np.mean(rb_y[root_idx])
 
         # 曲线点集中添加(root_x, root_y)
         curve_x.append(root_x)
         curve_y.append(root_y)
+        quad_fit.add(root_x, root_y)
         # 曲线的长度
         curve_len = 0
 
@@ -202,21 +506,27 @@ class TrackFit:
             # 添加到滑动窗口日志
             sld_win_hist.append((cur_x, cur_y))
             # 寻找候选点
-            roi_pt_idx = np.bitwise_and(
-                np.abs(rb_x - cur_x) < self.WIN_H/2,
-                np.abs(rb_y - cur_y) < self.WIN_W/2)
+            # 在x方向的候选点中, 按原有的判断条件筛选,
+            # 并恢复成原始的顺序, 保证均值的计算结果完全一致
+            lo, hi = win_lo[x_idx], win_hi[x_idx]
+            roi_pt_mask = np.bitwise_and(
+                np.abs(x_sorted[lo:hi] - cur_x) < self.WIN_H/2,
+                np.abs(y_by_x[lo:hi] - cur_y) < self.WIN_W/2)
+            roi_pt_idx = x_order[lo:hi][roi_pt_mask]
             # 计算ROI区域的点的个数
-            roi_pt_n = np.sum(roi_pt_idx)
+            roi_pt_n = len(roi_pt_idx)
             if roi_pt_n == 0:
                 # 继续向后查找
                 continue
+            roi_pt_idx.sort()
             # 标记点集的访问记录
-            is_pt_visited = np.bitwise_or(is_pt_visited, roi_pt_idx)
+            visited_idx_list.append(roi_pt_idx)
             # 计算均值重新修正cur_y
             cur_y = np.mean(rb_y[roi_pt_idx])
             # 添加曲线样本点            
             curve_x.append(cur_x)
             curve_y.append(cur_y)
+            quad_fit.add(cur_x, cur_y)
             # 更新斜率
             k = (cur_y - last_y) / (cur_x - last_x)
             # 增加曲线的长度
@@ -225,55 +535,187 @@ class TrackFit:
             # 更新上一个点
             last_x, last_y = cur_x, cur_y
         
+        if len(visited_idx_list) > 0:
+            is_pt_visited[np.concatenate(visited_idx_list)] = True
         curve_x = np.float32(curve_x)
         curve_y = np.float32(curve_y)
 
         return curve_x, curve_y, curve_len, sld_win_hist, is_pt_visited
 
-    def has_curve2(self, rb_x, rb_y, tail, is_pt_visited):
-        '''返回是否存在curve2以及遍历的方向'''
+    def predict_curve(self, odom):
+        '''根据上一帧的曲线1与机器人的运动, 预测当前帧机器人坐标系下的曲线1
+        odom: 里程信息 (累计前进的距离 单位cm, IMU偏航角 单位°, 逆时针为正)
+        返回值: 预测曲线的系数(a, b, c), 无法预测时返回None
+        '''
+        if odom is None or self.track_coeff is None or self.track_odom is None:
+            return None
+        a, b, c = self.track_coeff
+        # 机器人在上一帧坐标系下前进的距离与旋转的角度
+        dis = odom[0] - self.track_odom[0]
+        dyaw = math.radians((odom[1] - self.track_odom[1] + 180) % 360 - 180)
+        # 在上一帧的曲线上采样, 变换到当前帧的机器人坐标系下
+        x = np.linspace(self.RB_X_MIN, self.RB_X_MAX, num=20)
+        y = a*x*x + b*x + c
+        x = x - dis
+        cos_yaw, sin_yaw = math.cos(dyaw), math.sin(dyaw)
+        pred_x = cos_yaw * x + sin_yaw * y
+        pred_y = -sin_yaw * x + cos_yaw * y
+        pred_a, pred_b, pred_c, is_ok = QuadFit.fit(pred_x, pred_y)
+        return (pred_a, pred_b, pred_c) if is_ok else None
+
+    def c1_pt_track(self, rb_x, rb_y, pred_coeff, quad_fit=None):
+        '''曲线1跟踪采样: 只在预测曲线附近的带状区域内采样
+        pred_coeff: 预测曲线的系数(a, b, c)
+        quad_fit: 二次曲线拟合器QuadFit, 采样点会同步累加到拟合器中 (y = f(x))
+        返回值同c1_pt_sample, 带状区域内的点过少或者拟合残差过大时返回None
+        '''
+        if quad_fit is None:
+            quad_fit = QuadFit()
+        a, b, c = pred_coeff
+        # 预测曲线附近的点
+        band_idx = np.nonzero(np.abs(rb_y - (a*rb_x*rb_x + b*rb_x + c)) < self.TRACK_BAND)[0]
+        if len(band_idx) < self.TRACK_MIN_PT:
+            return None
+        # 沿x轴按照滑动窗口的高度分组, 每组的点取均值, 作为曲线的采样点
+        band_x = rb_x[band_idx]
+        bins, pt_inverse = np.unique(np.int32((band_x - np.min(band_x)) / self.WIN_H), return_inverse=True)
+        bin_n = np.bincount(pt_inverse)
+        curve_x = np.float32(np.bincount(pt_inverse, weights=band_x) / bin_n)
+        curve_y = np.float32(np.bincount(pt_inverse, weights=rb_y[band_idx]) / bin_n)
+        # 采样点之间的间隙过大时截断(与滑动窗口采样保持一致)
+        gap_idx = np.nonzero(np.diff(curve_x) > self.WIN_MAX_GAP)[0]
+        if len(gap_idx) > 0:
+            n_sample = gap_idx[0] + 1
+            curve_x, curve_y = curve_x[:n_sample], curve_y[:n_sample]
+            band_idx = band_idx[pt_inverse < n_sample]
+        # 与滑动窗口采样一致, 每个采样点的权重相同
+        quad_fit.add_points(curve_x, curve_y)
+        fit_a, fit_b, fit_c, is_ok = quad_fit.solve()
+        residual = np.sqrt(np.mean((curve_y - (fit_a*curve_x*curve_x + fit_b*curve_x + fit_c))**2))
+        if residual > self.TRACK_MAX_RESIDUAL:
+            return None
+        # 曲线的长度
+        curve_len = float(np.sum(np.hypot(np.diff(curve_x), np.diff(curve_y))))
+        # 采样框的记录(预测曲线上的点)
+        sld_win_hist = list(zip(curve_x, a*curve_x*curve_x + b*curve_x + c))
+        # 记录样本点是否被采样过
+        is_pt_visited = np.zeros_like(rb_x, dtype=bool)
+        is_pt_visited[band_idx] = True
+        return curve_x, curve_y, curve_len, sld_win_hist, is_pt_visited
+
+    def refine_curve(self, frame, coeff, x_min, x_max):
+        '''曲线1的多分辨率细化
+        沿x轴每隔REFINE_X_STEP取一条平行于y轴的采样线(以曲线为中心, 宽度为2*REFINE_BAND),
+        采样线上的点通过透视映射投影到高分辨率的灰度图中进行插值,
+        以暗像素的灰度为权重求直线中心的y坐标, 再重新拟合曲线
+        frame: 当前帧的图像金字塔FramePyramid
+        coeff: 缩略图拟合得到的曲线系数(a, b, c)
+        x_min, x_max: 曲线1采样点在x轴上的范围
+        返回值: 细化之后的曲线系数(a, b, c), 有效的采样线过少时返回None
+        '''
+        a, b, c = coeff
+        scale = min(self.REFINE_SCALE, frame.base_scale)
+        gray = frame.gray(scale)
+        # 采样点在机器人坐标系下的坐标, 尺寸为(采样线的个数, 每条采样线上点的个数)
+        sample_x = np.arange(max(x_min, self.RB_X_MIN), x_max + self.REFINE_X_STEP/2, self.REFINE_X_STEP)
+        sample_dy = np.arange(-self.REFINE_BAND, self.REFINE_BAND + self.REFINE_Y_STEP/2, self.REFINE_Y_STEP)
+        if len(sample_x) < self.TRACK_MIN_PT:
+            return None
+        center_y = a*sample_x*sample_x + b*sample_x + c
+        sample_y = center_y[:, None] + sample_dy[None, :]
+        # 投影到原图, 再换算到缩放之后的图像(以像素中心对齐)
+        px, py = self.cam.projection_mapping(np.repeat(sample_x[:, None], len(sample_dy), axis=1), sample_y)
+        map_x = np.float32((px + 0.5) * scale - 0.5)
+        map_y = np.float32((py + 0.5) * scale - 0.5)
+        # 图像范围之外的点当做白色背景
+        profile = np.float32(cv2.remap(gray, map_x, map_y, cv2.INTER_LINEAR, \
+            borderMode=cv2.BORDER_CONSTANT, borderValue=255))
+        # 每条采样线以灰度的中值为阈值, 比阈值暗的像素参与加权
+        gray_min = profile.min(axis=1)
+        gray_max = profile.max(axis=1)
+        weight = np.maximum((gray_min + gray_max)[:, None] / 2 - profile, 0)
+        # 有效的采样线: 对比度足够, 存在直线颜色的像素, 且暗像素没有延伸到带状区域的边界
+        is_valid = (gray_max - gray_min > self.REFINE_MIN_CONTRAST) & (gray_min < self.LINE_GRAY_MAX) & \
+            (weight[:, 0] == 0) & (weight[:, -1] == 0)
+        if np.count_nonzero(is_valid) < self.TRACK_MIN_PT:
+            return None
+        weight = weight[is_valid]
+        refine_x = sample_x[is_valid]
+        refine_y = center_y[is_valid] + (weight @ sample_dy) / weight.sum(axis=1)
+        refine_a, refine_b, refine_c, is_ok = QuadFit.fit(refine_x, refine_y)
+        # 细化之后的曲线偏离原曲线过远, 说明采样线上有其他的干扰
+        dy = refine_a*refine_x*refine_x + refine_b*refine_x + refine_c - center_y[is_valid]
+        if np.max(np.abs(dy)) > self.REFINE_BAND:
+            return None
+        return refine_a, refine_b, refine_c
+
+    def has_curve2(self, rb_x, rb_y, tail, is_pt_visited, pt_index=None):
+        '''返回是否存在curve2以及遍历的方向
+        pt_index: 点云索引PointIndex, 为None时现场构建
+        '''
         if tail is None:
             return False
+        if pt_index is None:
+            pt_index = PointIndex(rb_x, rb_y)
         # tail 曲线1末端的点
         tail_x, tail_y = tail
         # 获得末端点在ROI区域内未被访问到的点
+        # 先通过x坐标的索引找到候选点
+        lo, hi = PointIndex.search(pt_index.x_sorted, tail_x, self.TAIL_ROI_W/2)
         tail_roi_pt_idx = np.bitwise_and(
-            np.abs(rb_x - tail_x) < self.TAIL_ROI_W/2,
-            np.abs(rb_y - tail_y) < self.TAIL_ROI_H/2)
+            np.abs(pt_index.x_sorted[lo:hi] - tail_x) < self.TAIL_ROI_W/2,
+            np.abs(pt_index.y_by_x[lo:hi] - tail_y) < self.TAIL_ROI_H/2)
         # 必须还是未被访问过的点
-        tail_roi_pt_idx = np.bitwise_and(np.bitwise_not(is_pt_visited), tail_roi_pt_idx)
+        tail_roi_pt_idx = np.bitwise_and(np.bitwise_not(is_pt_visited[pt_index.x_order[lo:hi]]), tail_roi_pt_idx)
         # 统计ROI区域内未被访问过的点的个数
         roi_n = np.sum(tail_roi_pt_idx)
         if roi_n < self.TAIL_ROI_MIN_PT:
             # 判断没有曲线2
             return False, 0
         # 分别统计采样框上部跟下部的分布
-        roi_y = rb_y[tail_roi_pt_idx]
+        roi_y = pt_index.y_by_x[lo:hi][tail_roi_pt_idx]
         roi_n_posi = np.sum(roi_y > tail_y)
         roi_n_negi = roi_n - roi_n_posi
         # 获得曲线2的采样方向
         dir_y = self.DIR_Y_POSI if roi_n_posi > roi_n_negi else self.DIR_Y_NEGI
         return True, dir_y
 
-    def c2_pt_sample(self, rb_x, rb_y, root, dir_y):
-        '''曲线2通过滑动窗口(y方向)进行采样'''
+    def c2_pt_sample(self, rb_x, rb_y, root, dir_y, pt_index=None, quad_fit=None):
+        '''曲线2通过滑动窗口(y方向)进行采样
+        pt_index: 点云索引PointIndex, 为None时现场构建
+        quad_fit: 二次曲线拟合器QuadFit, 采样点会同步累加到拟合器中 (x = f(y))
+        '''
+        if pt_index is None:
+            pt_index = PointIndex(rb_x, rb_y)
+        if quad_fit is None:
+            quad_fit = QuadFit()
+        y_order, y_sorted, x_by_y = pt_index.y_order, pt_index.y_sorted, pt_index.x_by_y
         # 曲线拟合的起始点
         root_x, root_y = root
         # 根据遍历方向先对y坐标进行初筛
-        pt_idx = rb_y > root_y if dir_y == self.DIR_Y_POSI else rb_y < root_y
-        # 对y坐标进行筛选排序(默认顺序是从小到大)
-        rb_y_unique = np.sort(list(set(rb_y[pt_idx])))
+        # y坐标已经排好序, 初筛的结果是y_sorted的后半段或者前半段
+        root_y_split = y_sorted.dtype.type(root_y)
+        if dir_y == self.DIR_Y_POSI:
+            y_candi = y_sorted[np.searchsorted(y_sorted, root_y_split, side='right'):]
+        else:
+            y_candi = y_sorted[:np.searchsorted(y_sorted, root_y_split, side='left')]
+        # 对y坐标进行筛选(默认顺序是从小到大)
+        rb_y_unique = PointIndex.unique(y_candi)
         if dir_y == self.DIR_Y_NEGI:
             # 如果遍历顺序是Y轴负方向, 需要对rb_y_unique倒序 
             rb_y_unique = rb_y_unique[::-1]
+        # 每个滑动窗口在y方向上的候选点的范围 [win_lo, win_hi)
+        win_lo, win_hi = PointIndex.search(y_sorted, rb_y_unique, self.WIN_H/2)
         
         # 采样框的记录
         sld_win_hist = []
         # 记录样本点是否被采样过
-        is_pt_visited = np.zeros_like(rb_x, dtype=np.bool)
+        is_pt_visited = np.zeros_like(rb_x, dtype=bool)
+        visited_idx_list = []
         # 曲线的采样点的集合
         curve_x = [root_x, ]
         curve_y = [root_y, ]
+        quad_fit.add(root_y, root_x)
         # 曲线的长度
         curve_len = 0
         # 添加滑动窗口日志
@@ -295,21 +737,26 @@ class TrackFit:
             # 添加到滑动窗口日志
             sld_win_hist.append((cur_x, cur_y))
             # 寻找候选点
-            roi_pt_idx = np.bitwise_and(
-                np.abs(rb_x - cur_x) < self.WIN_W/2,
-                np.abs(rb_y - cur_y) < self.WIN_H/2)
+            # 在y方向的候选点中, 按原有的判断条件筛选, 并恢复成原始的顺序
+            lo, hi = win_lo[y_idx], win_hi[y_idx]
+            roi_pt_mask = np.bitwise_and(
+                np.abs(x_by_y[lo:hi] - cur_x) < self.WIN_W/2,
+                np.abs(y_sorted[lo:hi] - cur_y) < self.WIN_H/2)
+            roi_pt_idx = y_order[lo:hi][roi_pt_mask]
             # 计算窗口内的点的个数
-            roi_pt_n = np.sum(roi_pt_idx)
+            roi_pt_n = len(roi_pt_idx)
             if roi_pt_n == 0:
                 # 继续向后查找
                 continue
+            roi_pt_idx.sort()
             # 修改点的访问记录
-            is_pt_visited = np.bitwise_or(is_pt_visited, roi_pt_idx)
+            visited_idx_list.append(roi_pt_idx)
             # 计算均值 重新修正cur_x
             cur_x = np.mean(rb_x[roi_pt_idx])
             # 添加曲线样本
             curve_x.append(cur_x)
             curve_y.append(cur_y)
+            quad_fit.add(cur_y, cur_x)
             # 更新斜率
             k = (cur_x - last_x) / (cur_y - last_y)
             # 增加曲线长度
@@ -317,33 +764,50 @@ class TrackFit:
             # 更新上一个点
             last_x, last_y = cur_x, cur_y
         
+        if len(visited_idx_list) > 0:
+            is_pt_visited[np.concatenate(visited_idx_list)] = True
         curve_x = np.float32(curve_x)
         curve_y = np.float32(curve_y)
         
         return curve_x, curve_y, curve_len, sld_win_hist, is_pt_visited
 
     def rb2pixel(self, rx, ry, x_offset=20, y_offset=30, scale=10):
-        '''机器人坐标系到像素坐标系的转换'''
+        '''机器人坐标系到像素坐标系的转换
+        注: 数组输入时不修改调用者的数组
+        '''
         if type(rx) == np.ndarray:
-            rx[rx > 60] = 60
-            rx[rx < -20] = -20
-            ry[ry > 30] = 30
-            ry[ry < -30] = -30
-        else:
-            rx = 60 if rx > 60 else rx
-            rx = -20 if rx < -20 else rx
-            ry = 30 if ry > 30 else ry
-            ry = -30 if ry < -30 else ry
-
-        px = np.uint16(np.round(rx + x_offset) * scale)
+            # 限幅+平移+取整在同一个临时数组上原地完成
+            # 注: np.clip/np.round在小数组上的调用开销比ufunc大得多, 这里直接使用ufunc
+            px = np.maximum(rx, -20)
+            np.minimum(px, 60, out=px)
+            px += x_offset
+            np.rint(px, out=px)
+            px *= scale
+            # 注意y轴是反向的
+            py = np.maximum(ry, -30)
+            np.minimum(py, 30, out=py)
+            np.subtract(y_offset, py, out=py)
+            np.rint(py, out=py)
+            py *= scale
+            return px.astype(np.uint16), py.astype(np.uint16)
+        rx = 60 if rx > 60 else rx
+        rx = -20 if rx < -20 else rx
+        ry = 30 if ry > 30 else ry
+        ry = -30 if ry < -30 else ry
+        # 单个点使用Python的round(与np.round一样四舍六入五成双)
+        px = int(round(rx + x_offset)) * scale
         # 注意y轴是反向的
-        py = np.uint16(np.round(-ry + y_offset) * scale)
+        py = int(round(-ry + y_offset)) * scale
         
         return px, py
         
-    def curve_fit(self, rb_x, rb_y, is_draw=False):
-        '''曲线拟合'''
-        canvas = None # 画布
+    def curve_fit(self, rb_x, rb_y, is_draw=False, odom=None, frame=None, canvas=None):
+        '''曲线拟合
+        is_draw: 是否绘制机器人坐标系下的画布, 为False时不分配画布, 不进行任何绘制
+        canvas: 调用者本帧已经获取的画布(get_canvas), 为None时由curve_fit获取, 每一帧只拷贝一次模板
+        odom: 里程信息 (累计前进的距离 单位cm, IMU偏航角 单位°), 不为None时开启跟踪模式
+        frame: 当前帧的图像金字塔FramePyramid, 不为None时在高分辨率图像上细化曲线1
+        '''
         has_c1 = False # 曲线1是否存在
         has_c2 = False # 曲线2是否存在
         c1_a, c1_b, c1_c = 0, 0, 0 #　曲线1的系数
@@ -364,9 +828,24 @@ class TrackFit:
         next_yaw = 0
         tail = None
 
+        # 构建点云索引, 曲线1/曲线2的采样共用
+        pt_index = PointIndex(rb_x, rb_y)
+        # 曲线1/曲线2的二次曲线拟合器, 采样的同时累加
+        c1_fit = QuadFit()
+        c2_fit = QuadFit()
+        self.is_tracking = False
         if len(rb_x) >=1:
-            # 对曲线1进行拟合 采样相关的点
-            c1_x, c1_y, c1_len, c1_sld_win_hist, c1_pt_visited = self.c1_pt_sample(rb_x, rb_y)
+            # 跟踪模式: 在预测曲线附近采样
+            pred_coeff = self.predict_curve(odom)
+            c1_sample = None
+            if pred_coeff is not None:
+                c1_sample = self.c1_pt_track(rb_x, rb_y, pred_coeff, c1_fit)
+                self.is_tracking = c1_sample is not None and c1_sample[2] >= self.CURVE_MIN_LEN
+            if not self.is_tracking:
+                # 全局搜索: 对曲线1进行拟合 采样相关的点
+                c1_fit = QuadFit()
+                c1_sample = self.c1_pt_sample(rb_x, rb_y, pt_index, c1_fit)
+            c1_x, c1_y, c1_len, c1_sld_win_hist, c1_pt_visited = c1_sample
             # logging.info('曲线1的长度: {}'.format(c1_len))
             # 判断曲线1的长度是否合法
             has_c1 = c1_len >= self.CURVE_MIN_LEN
@@ -375,7 +854,16 @@ class TrackFit:
         if has_c1:
             # 对采集的点进行二次曲线拟合
             # 输入是x 输出是y
-            c1_a, c1_b, c1_c = np.polyfit(c1_x, c1_y, 2)
+            # 样本点过少时二次项病态, 退化为直线
+            c1_a, c1_b, c1_c, c1_fit_ok = c1_fit.solve()
+            if frame is not None and self.REFINE_SCALE is not None:
+                # 多分辨率细化: 在曲线1附近的高分辨率图像中重新定位直线
+                refine_coeff = self.refine_curve(frame, (c1_a, c1_b, c1_c), np.min(c1_x), np.max(c1_x))
+                if refine_coeff is not None:
+                    c1_a, c1_b, c1_c = refine_coeff
+            # 记录曲线1(修正偏移量之前)的系数, 用于下一帧的跟踪
+            self.track_coeff = (c1_a, c1_b, c1_c)
+            self.track_odom = odom
             # 求解直线上的点集
             c1_x_arr = np.linspace(self.RB_X_MIN, self.RB_X_MAX, num=20)
             c1_y_arr = c1_a*c1_x_arr*c1_x_arr + c1_b*c1_x_arr + c1_c
@@ -384,17 +872,17 @@ class TrackFit:
         
 
         # 判断是否存在曲线2
-        has_c2, y_dir = self.has_curve2(rb_x, rb_y, tail, c1_pt_visited)
+        has_c2, y_dir = self.has_curve2(rb_x, rb_y, tail, c1_pt_visited, pt_index)
         if has_c2:
             # 对线段2的数据点进行采样 
-            c2_x, c2_y, c2_len, c2_sld_win_hist, c2_pt_visited = self.c2_pt_sample(rb_x, rb_y, tail, y_dir)
+            c2_x, c2_y, c2_len, c2_sld_win_hist, c2_pt_visited = self.c2_pt_sample(rb_x, rb_y, tail, y_dir, pt_index, c2_fit)
             # 根据曲线2的长度再次判断曲线2是否合法
             has_c2 = c2_len >= self.CURVE_MIN_LEN
 
         if has_c2:
             # 对曲线2进行数据拟合
             # 输入是y 输出为x
-            c2_a, c2_b, c2_c = np.polyfit(c2_y, c2_x, 2)
+            c2_a, c2_b, c2_c, c2_fit_ok = c2_fit.solve()
             # 求解曲线2上的点集
             c2_y_arr = np.linspace(self.RB_Y_MIN, self.RB_Y_MAX, num=20)
             c2_x_arr = c2_a*c2_y_arr*c2_y_arr + c2_b*c2_y_arr + c2_c
@@ -456,6 +944,8 @@ class TrackFit:
             # 重置pt_near2org
             self.pt_near2org = (self.RB_X_MIN, 0)
             self.y_offset = 0
+            # 曲线丢失, 下一帧重新进行全局搜索
+            self.track_coeff = None
         # elif has_c2:
         #     # 只有曲线2没有曲线1
         #     # 只有拟合曲线2存在或者拟合曲线1跟拟合曲线2都不存在视为目标丢失
@@ -474,31 +964,20 @@ class TrackFit:
         if is_draw and self.PAINTER == 'CV':
             # 使用OpenCV进行图形绘制
             scale = 10 # 图像放大的倍数 1cm对象多少个像素点
-            # 创建一个空白地图
-            canvas = np.ones((60*scale, 80*scale, 3), dtype=np.uint8) * 255
-            # 绘制坐标系
-            x0, y0 = self.rb2pixel(0, 0)
-            x1, y1 = self.rb2pixel(4, 0)
-            x2, y2 = self.rb2pixel(0, 4)
-            # 绘制x轴
-            canvas = cv2.line(canvas, (x0, y0), (x1, y1), thickness=6, color=(0, 0, 255))
-            # 绘制y轴
-            canvas = cv2.line(canvas, (x0, y0), (x2, y2), thickness=6, color=(0, 255, 0))
-            # 绘制透视逆变换的点
+            if canvas is None:
+                # 空白地图+坐标系(预先分配, 每一帧重复使用)
+                canvas = self.get_canvas(scale)
+            # 绘制透视逆变换的点(灰色)
             px, py = self.rb2pixel(rb_x, rb_y)
-            for idx in range(len(px)):
-                # 绘制采样点(灰色)
-                # canvas[py[idx], px[idx]] = (125, 125, 125)
-                cv2.circle(canvas, (px[idx], py[idx]), radius=3, thickness=-1, color=(125, 125, 125))
+            self.draw_points(canvas, px, py, 3, (125, 125, 125))
             if has_c1:
                 # 绘制曲线
+                # 像素坐标直接写入预先分配的(N, 1, 2)数组, 一次polylines绘制整条曲线
                 p_c1_x_arr, p_c1_y_arr = self.rb2pixel(c1_x_arr, c1_y_arr)
-                for idx in range(1, len(p_c1_x_arr)):
-                    x0 = p_c1_x_arr[idx-1]
-                    x1 = p_c1_x_arr[idx]
-                    y0 = p_c1_y_arr[idx-1]
-                    y1 = p_c1_y_arr[idx]
-                    cv2.line(canvas, (x0, y0), (x1, y1), thickness=3, color=(255, 0, 0))
+                c1_polyline = self.get_buf('c1_polyline', (len(c1_x_arr), 1, 2), np.int32)
+                c1_polyline[:, 0, 0] = p_c1_x_arr
+                c1_polyline[:, 0, 1] = p_c1_y_arr
+                cv2.polylines(canvas, [c1_polyline], isClosed=False, thickness=3, color=(255, 0, 0))
                 # 绘制最近点跟后继点
                 x1, y1 = self.rb2pixel(pt_near2org[0], pt_near2org[1])
                 x2, y2 = self.rb2pixel(pt_next[0], pt_next[1])
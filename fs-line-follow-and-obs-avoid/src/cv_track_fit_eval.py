@@ -0,0 +1,187 @@
+'''
+赛道曲线拟合的离线批量评估
+读取图像目录或者视频文件, 每一帧依次进行 img_preprocess -> pixel_ipm -> curve_fit,
+多个进程并行处理不同的帧, 逐帧的结果按列保存(CSV/NPZ), 并统计吞吐量
+
+注: 帧与帧之间相互独立(不开启跟踪模式, 每一帧重置曲线的历史状态),
+    保证结果与进程个数以及处理顺序无关
+
+用法示例:
+    python3 cv_track_fit_eval.py --input=data/image_raw --output=track_eval.csv
+    python3 cv_track_fit_eval.py --input=../video/交通锥检测与测量.mkv --output=track_eval.npz --workers=4
+'''
+import os
+import re
+import csv
+import glob
+import time
+import logging
+import multiprocessing as mp
+import cv2
+import numpy as np
+from cv_camera import Camera
+from cv_track_fit import TrackFit
+from cv_frame_pyramid import FramePyramid
+from config import *
+
+# 支持的图像格式
+IMG_EXTS = ('.png', '.jpg', '.jpeg', '.bmp')
+# 输出结果的列名
+RESULT_COLUMNS = ('frame_idx', 'name', 'has_line', 'has_c1', 'has_c2', 'next_yaw', 'cross_ab', 'n_pt', 'is_refined', 't_ms')
+
+# 工作进程中的曲线拟合对象
+tk_curve_fit = None
+is_rm_distortion = False
+is_refine = True
+
+def load_ipm_remap(ipm_calc_online=False):
+    '''在主进程中载入(或者计算)一次透视逆变换矩阵, 再传给工作进程
+    工作进程只读取标定文件, 避免多个进程同时计算并写入config/ipm_remap.bin
+    返回值: (ipm_remap_x, ipm_remap_y), 存在标定数据包时为None(工作进程以内存映射的方式直接载入)
+    '''
+    cam = Camera(CAM_PORT_NAME)
+    try:
+        # 标定数据包(标定参数+透视逆变换矩阵)
+        cam.load_calib_bundle()
+        return None
+    except FileNotFoundError:
+        cam.load_cam_calib_data()
+        try:
+            cam.load_ipm_remap(calc_online=ipm_calc_online)
+        except FileNotFoundError:
+            logging.warning('[Eval] 未找到透视逆变换矩阵, 在内存中计算(不保存)')
+            cam.ipm_remap_x, cam.ipm_remap_y = cam.calc_ipm_remap()
+    return cam.ipm_remap_x, cam.ipm_remap_y
+
+def load_camera(ipm_remap=None):
+    '''载入相机的标定数据(不打开摄像头, 不写入文件)
+    ipm_remap: 主进程载入的透视逆变换矩阵, 为None时从标定数据包中载入
+    '''
+    cam = Camera(CAM_PORT_NAME)
+    if ipm_remap is None:
+        cam.load_calib_bundle()
+    else:
+        cam.load_cam_calib_data()
+        cam.ipm_remap_x, cam.ipm_remap_y = ipm_remap
+    return cam
+
+def worker_init(ipm_remap, rm_distortion, refine):
+    '''工作进程初始化: 每个进程各自创建相机与曲线拟合对象, 透视逆变换矩阵由主进程传入'''
+    global tk_curve_fit, is_rm_distortion, is_refine
+    tk_curve_fit = TrackFit(load_camera(ipm_remap))
+    is_rm_distortion = rm_distortion
+    is_refine = refine
+
+def eval_frame(task):
+    '''处理一帧图像
+    task: (帧序号, 名称, 图像或者图像路径)
+    返回值: 与RESULT_COLUMNS对应的元组, 图像读取失败时返回None
+    '''
+    frame_idx, name, img = task
+    if isinstance(img, str):
+        img = cv2.imread(img)
+        if img is None:
+            logging.error('[Eval] 图像读取失败: {}'.format(name))
+            return None
+    start = time.perf_counter()
+    if is_rm_distortion:
+        img = tk_curve_fit.cam.remove_distortion(img)
+    # 重置曲线的历史状态, 每一帧单独评估
+    tk_curve_fit.track_coeff = None
+    tk_curve_fit.pt_near2org = (tk_curve_fit.RB_X_MIN, 0)
+    tk_curve_fit.last_y_offset = 0
+    frame = FramePyramid(img)
+    has_line, bin_line = tk_curve_fit.img_preprocess(frame)
+    has_c1, has_c2, next_yaw, cross_ab, n_pt = False, False, 0.0, 0.0, 0
+    is_refined = False
+    if has_line:
+        rb_x, rb_y = tk_curve_fit.pixel_ipm(bin_line)
+        n_pt = len(rb_x)
+        if n_pt > 0:
+            has_c1, has_c2, next_yaw, cross_ab, _ = tk_curve_fit.curve_fit(rb_x, rb_y, \
+                frame=frame if is_refine else None)
+            is_refined = is_refine and has_c1
+    t_ms = (time.perf_counter() - start) * 1000
+    return (frame_idx, name, bool(has_line), bool(has_c1), bool(has_c2), float(next_yaw), float(cross_ab), \
+        int(n_pt), bool(is_refined), t_ms)
+
+def natural_key(path):
+    '''按照文件名中的数字排序(例如 2.png 排在 10.png 之前)'''
+    return [int(s) if s.isdigit() else s for s in re.split(r'(\d+)', os.path.basename(path))]
+
+def iter_tasks(input_path):
+    '''生成待处理的帧
+    图像目录: 只传递路径, 由工作进程读取图像(解码也并行)
+    视频文件: 主进程按顺序解码, 传递图像
+    '''
+    if os.path.isdir(input_path):
+        img_paths = [p for p in glob.glob(os.path.join(input_path, '*')) if p.lower().endswith(IMG_EXTS)]
+        for frame_idx, img_path in enumerate(sorted(img_paths, key=natural_key)):
+            yield frame_idx, os.path.basename(img_path), img_path
+    else:
+        capture = cv2.VideoCapture(input_path)
+        if not capture.isOpened():
+            raise FileNotFoundError('无法打开视频文件 {}'.format(input_path))
+        frame_idx = 0
+        while True:
+            ret, img = capture.read()
+            if not ret:
+                break
+            yield frame_idx, str(frame_idx), img
+            frame_idx += 1
+        capture.release()
+
+def save_results(results, output_path):
+    '''按列保存评估结果, 根据文件后缀选择格式(.csv / .npz)'''
+    if output_path.endswith('.npz'):
+        columns = list(zip(*results)) if len(results) > 0 else [()] * len(RESULT_COLUMNS)
+        np.savez(output_path, **{name: np.array(col) for name, col in zip(RESULT_COLUMNS, columns)})
+    else:
+        with open(output_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(RESULT_COLUMNS)
+            for row in results:
+                writer.writerow(['{:.3f}'.format(v) if isinstance(v, float) else int(v) if isinstance(v, bool) else v \
+                    for v in row])
+
+def main(argv):
+    n_worker = FLAGS.workers if FLAGS.workers > 0 else os.cpu_count()
+    ipm_remap = load_ipm_remap(FLAGS.ipm_calc_online)
+    with mp.Pool(n_worker, initializer=worker_init, \
+            initargs=(ipm_remap, FLAGS.rm_distortion, FLAGS.refine)) as pool:
+        start = time.time()
+        results = [r for r in pool.imap(eval_frame, iter_tasks(FLAGS.input), chunksize=FLAGS.chunksize) \
+            if r is not None]
+    t_total = time.time() - start
+    if len(results) == 0:
+        logging.error('[Eval] 没有可以处理的图像: {}'.format(FLAGS.input))
+        return
+    save_results(results, FLAGS.output)
+
+    # 吞吐量统计
+    t_frame = np.float64([r[-1] for r in results])
+    n_line = sum(r[2] for r in results)
+    n_c1 = sum(r[3] for r in results)
+    n_c2 = sum(r[4] for r in results)
+    logging.info('[Eval] 帧数: {} 有直线: {} 曲线1: {} 曲线2: {}'.format(len(results), n_line, n_c1, n_c2))
+    logging.info('[Eval] 进程数: {} 总耗时: {:.2f}s 吞吐量: {:.1f}帧/s'.format(n_worker, t_total, len(results) / t_total))
+    logging.info('[Eval] 单帧耗时 平均: {:.2f}ms P50: {:.2f}ms P95: {:.2f}ms P99: {:.2f}ms'.format( \
+        np.mean(t_frame), *np.percentile(t_frame, [50, 95, 99])))
+    logging.info('[Eval] 结果保存在 {}'.format(FLAGS.output))
+
+if __name__ == '__main__':
+    from absl import app
+    from absl import flags
+
+    # 设置日志等级
+    logging.basicConfig(level=logging.INFO)
+    # 定义参数
+    FLAGS = flags.FLAGS
+    flags.DEFINE_string('input', 'data/image_raw', '图像目录或者视频文件的路径')
+    flags.DEFINE_string('output', 'track_eval.csv', '评估结果的保存路径(.csv / .npz)')
+    flags.DEFINE_integer('workers', 0, '工作进程的个数, 为0时等于CPU核数')
+    flags.DEFINE_integer('chunksize', 4, '每次分配给工作进程的帧数')
+    flags.DEFINE_boolean('rm_distortion', False, '去除图像畸变')
+    flags.DEFINE_boolean('refine', True, '在高分辨率图像上细化曲线1')
+    flags.DEFINE_boolean('ipm_calc_online', False, '是否在线计算透视逆变换矩阵')
+    app.run(main)
@@ -5,6 +5,7 @@ import math
 import cv2
 import numpy as np
 from cv_camera import Camera
+from cv_frame_pyramid import FramePyramid
 from config import *
 
 class TrafficConeDetect:
@@ -14,6 +15,15 @@ class TrafficConeDetect:
 
     def __init__(self, cam):
         self.cam = cam
+        # 图像预处理的缓存, 每一帧重复使用 {名称: 数组}
+        self.bufs = {}
+
+    def get_buf(self, name, shape, dtype=np.uint8):
+        '''获取预先分配的缓存, 尺寸变化时重新分配'''
+        buf = self.bufs.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = self.bufs[name] = np.empty(shape, dtype=dtype)
+        return buf
 
     def find_contours(self, img_bin):
         '''寻找连通域(兼容不同的CV版本)'''
@@ -23,15 +33,22 @@ class TrafficConeDetect:
             img, contours, hierarchy =  cv2.findContours(img_bin, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         return contours
 
-    def preprocessing(self, img, w_threshold=None):
-        '''图像预处理'''
+    def preprocessing(self, img, w_threshold=None, img_scale=1.0):
+        '''图像预处理
+        img: 输入图像, 也可以是多个检测器共享的图像金字塔FramePyramid
+        img_scale: 输入图像相对原图的缩放比例
+        注: 返回的二值化图像是预先分配的缓存, 下一帧会被覆盖
+        '''
         has_cone = False # 画面中是否有交通锥
+        frame = img if isinstance(img, FramePyramid) else FramePyramid(img, img_scale)
         # 将彩图缩放为小图
-        img_small_bgr = cv2.resize(img, dsize=None, fx=self.IMG_SCALE_FACTOR, fy=self.IMG_SCALE_FACTOR)
+        img_small_size = frame.level_shape(self.IMG_SCALE_FACTOR)
+        img_small_bgr = frame.resize(self.IMG_SCALE_FACTOR, dst=self.get_buf('img_small', img_small_size + (3,)))
         # 获取图像的高度与宽度
         img_h, img_w= img_small_bgr.shape[:2]
         # 根据颜色获取交通锥的二值化图像
-        bin_cone = cv2.inRange(img_small_bgr, lowerb=CONE_RED_LOWERB, upperb=CONE_RED_UPPERB)
+        bin_cone = cv2.inRange(img_small_bgr, lowerb=CONE_RED_LOWERB, upperb=CONE_RED_UPPERB, \
+            dst=self.get_buf('bin_cone', (img_h, img_w)))
         # 获取最大的contour
         contours = self.find_contours(bin_cone)
 
@@ -59,11 +76,12 @@ class TrafficConeDetect:
 
     def cone_measure(self, cone_rect):
         '''计算机器人与交通锥之间的距离'''
-        # 计算矩形底部中心的坐标
+        # 计算矩形底部中心的坐标(亚像素)
         x, y, w, h = cone_rect
-        btm_x, btm_y = int(x+w/2), int(y+h)
+        btm_x, btm_y = x+w/2, y+h
         # 透视逆变换 计算该点在机器人基坐标系下的位置
-        rx, ry = self.cam.inverse_projection_mapping2(btm_x, btm_y)
+        rb_x, rb_y = self.cam.inverse_projection_mapping2_batch(btm_x, btm_y, bilinear=True)
+        rx, ry = float(rb_x), float(rb_y)
         # 计算距离
         distance = math.sqrt(rx**2 + ry**2)
         return distance, (rx, ry)
@@ -2,6 +2,7 @@
 巡线+壁障+ArucoTag识别
 
 '''
+import os
 import math
 import time # 时间,延时
 import multiprocessing as mp # 多进程
@@ -20,9 +21,14 @@ from geometry import Geometry
 # 图像处理
 import cv2
 from cv_camera import Camera
+from cv_frame_source import FrameSource
+from cv_frame_ring import FrameRing
+from cv_frame_pyramid import FramePyramid
 from cv_track_fit  import TrackFit
 from cv_traffic_cone import TrafficConeDetect
 from cv_aruco import ArucoDetect
+from cv_display import DisplayProcess
+from cv_timing import StageTimer
 
 # 补光灯 I/O控制
 from gpiozero import LED
@@ -51,11 +57,16 @@ new_imu_pose_dict =manager.dict({'roll': 0.0, 'pitch': 0.0, 'yaw': 0.0}) # 新
 action_group_list = manager.list() # 动作组指令序列(依次执行)
 # 巡线相关变量
 ns.cv_update_t = time.time() # 视觉信息的更新时间
+# 并行模式下, 各个图像处理进程的更新时间
+ns.cv_track_t = ns.cv_update_t
+ns.cv_cone_t = ns.cv_update_t
+ns.cv_aruco_t = ns.cv_update_t
 ns.cv_track_switch = False # 巡线拟合开关
 ns.has_line = False # 画面中是否有曲线
 ns.has_c1 = False # 曲线1是否存在
 ns.has_c2 = False # 曲线2是否存在
 ns.next_yaw = 0 # 下一步的目标偏航
+ns.go_forward_dis = 0.0 # 机器人累计前进的距离(单位cm, 见ACTION_FORWARD_DIS), 巡线跟踪模式据此预测曲线的位置
 ns.cross_ab = 0 # 向量A跟向量B叉乘的结果
 # 交通锥相关变量
 ns.cv_cone_switch = False # 交通锥是被开关
@@ -83,11 +94,19 @@ def angle_adjust(angle):
     angle = angle % 360
     return angle - 360.0  if angle > 180.0 else angle
     
+def get_cv_update_t():
+    '''视觉信息的更新时间
+    并行模式下, 以最慢的图像处理进程为准
+    '''
+    if CV_PARALLEL:
+        return min(ns.cv_track_t, ns.cv_cone_t, ns.cv_aruco_t)
+    return ns.cv_update_t
+
 def wait_cv_update():
     # 图像处理信息是否过时
     cur_time = time.time()
     # 一直等待视觉信息更新
-    while (cur_time+0.05) > ns.cv_update_t:
+    while (cur_time+0.05) > get_cv_update_t():
         time.sleep(0.001)
 
 def wait_dbsp_done():
@@ -177,6 +196,8 @@ def worker_dbsp_action_group():
             if action_group_name in ACTION_GROUP_MAP:
                 # 执行动作组
                 am.execute(ACTION_GROUP_MAP[action_group_name]())
+                if action_group_name in ACTION_FORWARD_DIS:
+                    ns.go_forward_dis += ACTION_FORWARD_DIS[action_group_name]
             elif action_group_name == 'RAISE_HEAD':
                 # 机器人抬头
                 angle_ctl_event = ServoAngleControlEvent([[HEAD_SERVO_ID, 0, 100]])
@@ -194,22 +215,155 @@ def worker_dbsp_action_group():
         dbsp_action_evt.clear()
         dbsp_action_done.set()
 
+def cv_load_calib(cam):
+    '''载入相机的标定数据'''
+    try:
+        # 通过内存映射载入标定数据包(标定参数+透视逆变换矩阵)
+        cam.load_calib_bundle()
+    except FileNotFoundError:
+        logging.warning('[CV] 未找到标定数据包 {}, 请运行 update_calib_bundle.py 生成'.format(CAM_CALIB_BUNDLE))
+        cam.load_cam_calib_data() # 载入标定参数
+        cam.load_ipm_remap(calc_online=False) # 载入透视逆变换矩阵
+
+def cv_create_display(n_source=1):
+    '''创建画面预览进程(尚未开启), 不预览画面时返回None
+    n_source: 发布画面的图像处理进程的个数, 队列中为每个进程预留两帧
+    '''
+    if not DISPLAY_IMAGE:
+        return None
+    return DisplayProcess(fps=DISPLAY_FPS, record_dir=DISPLAY_RECORD_DIR, maxsize=2*n_source)
+
+def cv_start_display():
+    '''开启画面预览进程, 不预览画面时返回None
+    窗口的刷新(imshow/waitKey)在独立的进程中进行, 不会拖慢图像处理
+    '''
+    display = cv_create_display()
+    return display.start() if display is not None else None
+
+def cv_show(display, canvas_dict):
+    '''发布画面到预览进程(不阻塞), 返回按键'''
+    display.publish(canvas_dict)
+    return display.get_key()
+
+def cv_start_timer(name):
+    '''创建图像处理各个阶段的耗时统计'''
+    return StageTimer(capacity=CV_TIMING_FRAMES, name=name, log_interval=CV_TIMING_LOG_INTERVAL)
+
+def cv_stop_timer(timer):
+    '''退出时输出各个阶段的耗时统计, 并导出Chrome Trace'''
+    timer.log_report()
+    if CV_TIMING_TRACE_DIR is None:
+        return
+    try:
+        os.makedirs(CV_TIMING_TRACE_DIR, exist_ok=True)
+        trace_path = os.path.join(CV_TIMING_TRACE_DIR, 'trace_{}_{}.json'.format( \
+            timer.name.lower().replace(' ', '_'), time.strftime('%Y%m%d_%H%M%S')))
+        timer.export_chrome_trace(trace_path)
+    except OSError as e:
+        logging.error('[{} Timing] Chrome Trace保存失败: {}'.format(timer.name, e))
+
+def cv_decode_scale(tk_curve_fit, cone_detect):
+    '''根据当前的游戏阶段, 选择MJPEG解码的缩放比例
+    取各个开启的图像处理任务所需缩放比例的最大值
+    '''
+    if cv_aruco_switch_on():
+        # ArucoTag识别需要原始分辨率的图像
+        # 注: 画面预览不影响解码的比例, 预览画布由cv_canvas放大到原图尺寸
+        return 1.0
+    scale = tk_curve_fit.DECODE_SCALE
+    if cv_cone_switch_on():
+        scale = max(scale, cone_detect.IMG_SCALE_FACTOR)
+    return scale
+
+def cv_canvas(frame):
+    '''原图尺寸的画布(仅用于画面预览)
+    缩小比例解码时, 将解码得到的小图放大到原图尺寸, 标注的像素坐标与原图保持一致
+    '''
+    if frame.base_scale == 1.0:
+        return np.copy(frame.base)
+    return cv2.resize(frame.base, dsize=None, fx=1.0/frame.base_scale, fy=1.0/frame.base_scale, \
+        interpolation=cv2.INTER_NEAREST)
+
+def cv_track_step(tk_curve_fit, frame, canvas_img, timer):
+    '''图像处理-曲线拟合
+    frame: 当前帧的图像金字塔, 各个检测器共享
+    canvas_img: 原图画布, 为None时不进行任何绘制(不预览画面)
+    timer: 各个阶段的耗时统计(预处理/透视逆变换/拟合)
+    '''
+    # img = cam.remove_distortion(img)  # 图像去除畸变        
+    timer.start('preprocess')
+    ns.has_line, bin_line = tk_curve_fit.img_preprocess(frame)
+    timer.stop('preprocess')
+    canvas_robo = None # 机器人坐标系下的实物图
+    if canvas_img is not None:
+        # 预先分配的画布(白底+坐标系), 每一帧重复使用
+        canvas_robo = tk_curve_fit.get_canvas()
+    
+    if ns.cv_track_switch and  ns.has_line:
+        # 透视逆变换
+        timer.start('ipm')
+        rb_x, rb_y = tk_curve_fit.pixel_ipm(bin_line, canvas=canvas_img)
+        timer.stop('ipm')
+        # 里程信息(前进的距离, 偏航角), 用于跟踪模式预测曲线的位置
+        odom = (ns.go_forward_dis, imu_pose_dict['yaw']) if CV_TRACK_TEMPORAL else None
+        # 曲线拟合(样本点过少时自动退化为直线拟合, 不会抛出异常)
+        # 曲线1不存在时返回 has_c1=False, next_yaw=0, 不会保留上一帧的结果
+        # 曲线1在高分辨率的图像上细化
+        timer.start('fit')
+        ns.has_c1, ns.has_c2, ns.next_yaw, ns.cross_ab, canvas = tk_curve_fit.curve_fit(rb_x, rb_y, \
+            is_draw=canvas_img is not None, odom=odom, frame=frame, canvas=canvas_robo)
+        timer.stop('fit')
+        if canvas is not None:
+            canvas_robo = canvas
+    return bin_line, canvas_robo
+
+def cv_cone_switch_on():
+    '''交通锥识别是否开启(绕过的交通锥个数小于指定值)'''
+    return ns.cv_cone_switch and ns.cone_cnt < TRAFFIC_CONE_NUM
+
+def cv_cone_step(cone_detect, frame, canvas_img):
+    '''图像处理-交通锥识别'''
+    bin_cone = None
+    if cv_cone_switch_on():
+        ns.has_cone, bin_cone, cone_rect = cone_detect.preprocessing(frame, w_threshold=ns.cone_w_threshold)
+        if ns.has_cone:
+            # 交通锥视觉测量
+            ns.dis_rb2cone, cone_posi = cone_detect.cone_measure(cone_rect)
+            ns.cone_x, ns.cone_y = cone_posi
+            # 可视化
+            if canvas_img is not None:
+                canvas_img = cone_detect.visualization(ns.has_cone, canvas_img, \
+                    cone_rect=cone_rect, distance=ns.dis_rb2cone, cone_posi=cone_posi)
+            
+            ns.find_cone_time = time.time()
+    return bin_cone, canvas_img
+
+def cv_aruco_switch_on():
+    '''ArucoTag识别是否开启
+    注: ArucoTag只需要识别一次
+    '''
+    return ns.cv_aruco_switch and not ns.has_aruco
+
+def cv_aruco_step(aruco_detect, frame, canvas_img):
+    '''图像处理-ArucoTag识别'''
+    if cv_aruco_switch_on():
+        # TODO has_aruco, canvas, aruco_id, dis_cam2aruco
+        ns.has_aruco, canvas_img, ns.aurco_id, ns.dis_cam2aruco = aruco_detect.find_aruco(frame, canvas_img, \
+            is_draw=canvas_img is not None)
+        if ns.has_aruco:
+            ns.dis_rb2aruco =  math.sqrt(ns.dis_cam2aruco**2 - (CAM_H - ARUCO_H)**2)
+            ns.dis_rb2fork = ns.dis_rb2aruco - DISTANCE_ARUCO2FORK
+    return canvas_img
+
 def worker_cv():
     '''子进程-图像处理'''
-    if DISPLAY_IMAGE:
-        # 创建图像处理的窗口
-        cv2.namedWindow('img_raw',flags=cv2.WINDOW_NORMAL | cv2.WINDOW_KEEPRATIO | cv2.WINDOW_GUI_EXPANDED)
-        if DISPLAY_BIN_LINE:
-            cv2.namedWindow('bin_line',flags=cv2.WINDOW_NORMAL | cv2.WINDOW_KEEPRATIO | cv2.WINDOW_GUI_EXPANDED)
-        cv2.namedWindow('canvas_robo',flags=cv2.WINDOW_NORMAL | cv2.WINDOW_KEEPRATIO | cv2.WINDOW_GUI_EXPANDED)
-        if DISPLAY_BIN_CONE:
-            cv2.namedWindow('bin_cone',flags=cv2.WINDOW_NORMAL | cv2.WINDOW_KEEPRATIO | cv2.WINDOW_GUI_EXPANDED)
+    display = cv_start_display() # 画面预览进程
+    timer = cv_start_timer('CV') # 各个阶段的耗时统计
 
     cam = Camera(device=CAM_PORT_NAME) # 初始化相机
     cam.init_camera() # 相机初始化
-    capture = cam.get_video_capture() # 创建capture对象
-    cam.load_cam_calib_data() # 载入标定参数
-    cam.load_ipm_remap(calc_online=False) # 载入透视逆变换矩阵
+    cv_load_calib(cam) # 载入标定数据
+    frame_src = FrameSource(cam, raw_mjpeg=CAM_DECODE_REDUCED).start() # 后台线程采集图像
     cam_init_evt.set() # 设置相机初始化事件
 
     # 创建赛道曲线拟合的对象
@@ -219,72 +373,52 @@ def worker_cv():
     # ArucoTag检测
     aruco_detect = ArucoDetect(cam)
     
+    frame_seq = 0 # 已经处理过的图像序号
     try:
         while True:
             # 游戏终止
             if game_finish_evt.is_set():
                 break
 
-            start = time.time() # 开始计时
-            ret, img = capture.read() # 获取原始图像
+            timer.new_frame()
+            timer.start('capture') # 采集耗时包括等待新的一帧以及MJPEG解码
+            # 获取最新的一帧图像, 以及它的采集时间
+            ret, img, frame_t, frame_seq = frame_src.read(frame_seq)
+            if ret and (img.ndim == 1 or img.shape[0] == 1):
+                # MJPEG原始数据, 按照当前游戏阶段所需的最小分辨率解码
+                frame = FramePyramid(mjpeg_buf=img, \
+                    decode_scale=cv_decode_scale(tk_curve_fit, cone_detect), cam=cam)
+                ret = frame.decode()
+            elif ret:
+                frame = FramePyramid(img)
             if not ret:
                 logging.error('[CV] Error 图像获取失败')
                 time.sleep(0.1)
                 continue
+            timer.stop('capture')
             
+            # 画布(不预览画面时不需要拷贝)
+            canvas_img = cv_canvas(frame) if DISPLAY_IMAGE else None
             ## 图像处理-曲线拟合
-            # img = cam.remove_distortion(img)  # 图像去除畸变        
-            ns.has_line, bin_line = tk_curve_fit.img_preprocess(img)
-            canvas_img = np.copy(img) # 画布
-            canvas_robo =  np.ones((600, 800, 3)) # 机器人坐标系下的实物图
-            bin_cone = None
-            
-            if ns.cv_track_switch and  ns.has_line:
-                try:
-                    # 透视逆变换
-                    rb_x, rb_y = tk_curve_fit.pixel_ipm(bin_line, canvas=canvas_img)
-                    # 曲线拟合
-                    ns.has_c1, ns.has_c2, ns.next_yaw, ns.cross_ab, canvas_robo = tk_curve_fit.curve_fit(rb_x, rb_y, is_draw=True)
-                except np.RankWarning as e:
-                    # 拟合的时候, 样本点过少, 直线丢失
-                    ns.has_line = False
-                    logging.warning(e)
-
+            bin_line, canvas_robo = cv_track_step(tk_curve_fit, frame, canvas_img, timer)
             ## 图像处理-交通锥识别
-            if ns.cv_cone_switch and ns.cone_cnt < TRAFFIC_CONE_NUM:
-                # 如果绕过的交通锥个数小于指定值
-                ns.has_cone, bin_cone, cone_rect = cone_detect.preprocessing(img, w_threshold=ns.cone_w_threshold)
-                if ns.has_cone:
-                    # 交通锥视觉测量
-                    ns.dis_rb2cone, cone_posi = cone_detect.cone_measure(cone_rect)
-                    ns.cone_x, ns.cone_y = cone_posi
-                    # 可视化
-                    canvas_img = cone_detect.visualization(ns.has_cone, canvas_img, \
-                        cone_rect=cone_rect, distance=ns.dis_rb2cone, cone_posi=cone_posi)
-                    
-                    ns.find_cone_time = time.time()
-                       
+            timer.start('cone')
+            bin_cone, canvas_img = cv_cone_step(cone_detect, frame, canvas_img)
+            timer.stop('cone')
             ## 图像处理-ArucoTag识别
-            # 注: ArucoTag只需要识别一次
-            if ns.cv_aruco_switch and not ns.has_aruco:
-                # TODO has_aruco, canvas, aruco_id, dis_cam2aruco
-                ns.has_aruco, canvas_img, ns.aurco_id, ns.dis_cam2aruco = aruco_detect.find_aruco(img, canvas_img)
-                if ns.has_aruco:
-                    ns.dis_rb2aruco =  math.sqrt(ns.dis_cam2aruco**2 - (CAM_H - ARUCO_H)**2)
-                    ns.dis_rb2fork = ns.dis_rb2aruco - DISTANCE_ARUCO2FORK
+            timer.start('aruco')
+            canvas_img = cv_aruco_step(aruco_detect, frame, canvas_img)
+            timer.stop('aruco')
                 
-            end = time.time() # 停止计时
-            ns.cv_update_t = time.time() # 图像数据更新的时间
+            ns.cv_update_t = frame_t # 图像数据更新的时间(以图像的采集时间为准)
             # 画面同步与显示
-            if DISPLAY_IMAGE:
-                cv2.imshow('img_raw', canvas_img)
-                if DISPLAY_BIN_LINE:
-                    cv2.imshow('bin_line', bin_line)
-                cv2.imshow('canvas_robo', canvas_robo)
-                if DISPLAY_BIN_CONE and bin_cone is not None:
-                    cv2.imshow('bin_cone', bin_cone)
-
-                key = cv2.waitKey(1)
+            if display is not None:
+                timer.start('display')
+                key = cv_show(display, {'img_raw': canvas_img, \
+                    'bin_line': bin_line if DISPLAY_BIN_LINE else None, \
+                    'canvas_robo': canvas_robo, \
+                    'bin_cone': bin_cone if DISPLAY_BIN_CONE else None})
+                timer.stop('display')
                 if key == ord('q'):
                     # 如果按键为q 代表quit 退出程序
                     break
@@ -295,9 +429,130 @@ def worker_cv():
     except Exception as e:
         logging.error('[CV] ERROR: {}'.format(e))
     
+    frame_src.release() # 关闭摄像头
+    if display is not None:
+        display.stop() # 关闭画面预览进程
+    cv_stop_timer(timer) # 输出各个阶段的耗时统计
+    game_finish_evt.set() # 游戏结束标志位设定
+
+def worker_cv_capture(display=None):
+    '''子进程-图像采集(并行模式)
+    将图像直接解码到共享内存的环形缓冲区中
+    display: 各个图像处理进程共用的画面预览进程(由采集进程负责开启与关闭), 不预览画面时为None
+    '''
+    if display is not None:
+        display.start()
+    cam = Camera(device=CAM_PORT_NAME) # 初始化相机
+    cam.init_camera() # 相机初始化
+    capture = cam.get_video_capture() # 创建capture对象
+    # 根据第一帧图像的尺寸创建环形缓冲区
+    ret, img = capture.read()
+    while not ret:
+        logging.error('[CV CAPTURE] Error 图像获取失败')
+        time.sleep(0.1)
+        ret, img = capture.read()
+    ring = FrameRing.create(CV_FRAME_RING_NAME, img.shape, n_slot=CV_FRAME_RING_SLOT)
+    ring.publish(img, time.time())
+    cam_init_evt.set() # 设置相机初始化事件
+
+    try:
+        while not game_finish_evt.is_set():
+            buf = ring.begin_write()
+            ret, img = capture.read(buf) # 直接解码到共享内存中
+            if ret and img is not buf:
+                # 解码结果没有写入缓冲区(例如尺寸发生变化), 退化为拷贝
+                np.copyto(buf, img)
+            ring.end_write(time.time() if ret else None)
+            if not ret:
+                logging.error('[CV CAPTURE] Error 图像获取失败')
+                time.sleep(0.1)
+    except KeyboardInterrupt:
+        logging.info('[CV CAPTURE] 按键中断,游戏结束')
+    except Exception as e:
+        logging.error('[CV CAPTURE] ERROR: {}'.format(e))
+    
     capture.release() # 关闭摄像头
-    if DISPLAY_IMAGE:
-        cv2.destroyAllWindows() # 销毁所有的窗口
+    ring.close() # 释放共享内存
+    if display is not None:
+        display.stop() # 关闭画面预览进程
+    game_finish_evt.set() # 游戏结束标志位设定
+
+def worker_cv_detector(role, display=None):
+    '''子进程-图像处理(并行模式)
+    从共享内存读取最新一帧, 只负责一种图像处理任务
+    role: 'track' 曲线拟合, 'cone' 交通锥识别, 'aruco' ArucoTag识别
+    display: 各个图像处理进程共用的画面预览进程, 只负责发布画面, 不预览画面时为None
+    '''
+    cam_init_evt.wait() # 等待采集进程创建环形缓冲区
+    ring = FrameRing.attach(CV_FRAME_RING_NAME)
+    cam = Camera(device=CAM_PORT_NAME)
+    cv_load_calib(cam) # 载入标定数据(内存映射, 多进程共享)
+    if role == 'track':
+        detector = TrackFit(cam)
+        is_switch_on = lambda: True # 是否存在曲线每一帧都需要判断
+    elif role == 'cone':
+        detector = TrafficConeDetect(cam)
+        is_switch_on = cv_cone_switch_on
+    else:
+        detector = ArucoDetect(cam)
+        is_switch_on = cv_aruco_switch_on
+    timer = cv_start_timer('CV {}'.format(role.upper())) # 各个阶段的耗时统计
+    
+    img_buf = np.empty(ring.shape, dtype=np.uint8) # 预先分配的图像缓存
+    update_t_name = 'cv_{}_t'.format(role) # 图像数据更新时间在命名空间中的变量名
+    frame_seq = 0 # 已经处理过的图像序号
+    try:
+        while not game_finish_evt.is_set():
+            if not is_switch_on():
+                # 开关关闭的时候不需要处理图像, 直接标记为已更新
+                # 注: 先获取图像的序号, 再判断开关, 避免遗漏开关刚刚打开之后的图像
+                frame_seq = ring.latest_seq
+                frame_t = ring.slot_header[frame_seq % ring.n_slot, 2] / 1e9
+                if not is_switch_on():
+                    setattr(ns, update_t_name, frame_t)
+                    time.sleep(0.01)
+                    continue
+            
+            timer.new_frame()
+            timer.start('capture')
+            ret, img, frame_t, frame_seq = ring.read(frame_seq, dst=img_buf)
+            if not ret:
+                logging.error('[CV {}] Error 图像获取失败'.format(role.upper()))
+                continue
+            timer.stop('capture')
+            
+            frame = FramePyramid(img) # 图像金字塔
+            canvas_img = np.copy(img) if DISPLAY_IMAGE else None # 画布
+            if role == 'track':
+                bin_line, canvas_robo = cv_track_step(detector, frame, canvas_img, timer)
+                canvas_dict = {'img_raw': canvas_img, 'canvas_robo': canvas_robo, \
+                    'bin_line': bin_line if DISPLAY_BIN_LINE else None}
+            elif role == 'cone':
+                timer.start('cone')
+                bin_cone, canvas_img = cv_cone_step(detector, frame, canvas_img)
+                timer.stop('cone')
+                canvas_dict = {'img_cone': canvas_img, 'bin_cone': bin_cone if DISPLAY_BIN_CONE else None}
+            else:
+                timer.start('aruco')
+                canvas_img = cv_aruco_step(detector, frame, canvas_img)
+                timer.stop('aruco')
+                canvas_dict = {'img_aruco': canvas_img}
+            setattr(ns, update_t_name, frame_t) # 图像数据更新的时间
+            
+            if display is not None:
+                timer.start('display')
+                key = cv_show(display, canvas_dict)
+                timer.stop('display')
+                if key == ord('q'):
+                    # 如果按键为q 代表quit 退出程序
+                    break
+    except KeyboardInterrupt:
+        logging.info('[CV {}] 按键中断,游戏结束'.format(role.upper()))
+    except Exception as e:
+        logging.error('[CV {}] ERROR: {}'.format(role.upper(), e))
+    
+    ring.close()
+    cv_stop_timer(timer) # 输出各个阶段的耗时统计
     game_finish_evt.set() # 游戏结束标志位设定
 
 def robot_turn(yaw=None, dyaw=None):
@@ -586,14 +841,23 @@ if __name__ == '__main__':
     # IMU位姿融合进程
     process_imu = mp.Process(target=worker_imu_pose)
     # 图像处理进程
-    process_cv = mp.Process(target=worker_cv)
+    if CV_PARALLEL:
+        # 并行模式: 采集进程 + 3个图像处理进程
+        # 3个图像处理进程共用一个画面预览进程(在采集进程中开启), 避免多个进程争抢窗口
+        cv_roles = ('track', 'cone', 'aruco')
+        display = cv_create_display(n_source=len(cv_roles))
+        process_cv_list = [mp.Process(target=worker_cv_capture, args=(display,))] + \
+            [mp.Process(target=worker_cv_detector, args=(role, display)) for role in cv_roles]
+    else:
+        process_cv_list = [mp.Process(target=worker_cv)]
 
     if LAMP_ON:
         lamp.on() # 开启补光灯
     # 开启进程
     process_dbsp.start()
     process_imu.start()
-    process_cv.start()
+    for process_cv in process_cv_list:
+        process_cv.start()
 
     main() # 执行主程序
     process_imu.terminate()
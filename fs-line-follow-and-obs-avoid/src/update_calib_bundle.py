@@ -0,0 +1,20 @@
+'''
+将旧版的pickle标定数据(camera_info.bin / ipm_remap.bin)
+转换为可内存映射的标定数据包
+'''
+import os
+from cv_camera import Camera
+from config import CAM_PORT_NAME, CAM_CALIB_BUNDLE
+
+# 创建相机对象
+cam = Camera(CAM_PORT_NAME)
+# 载入标定数据
+cam.load_cam_calib_data()
+# 载入透视逆变换矩阵
+if os.path.exists('config/ipm_remap.bin'):
+	cam.load_ipm_remap(calc_online=False)
+else:
+	cam.ipm_remap_x, cam.ipm_remap_y = cam.calc_ipm_remap()
+# 保存标定数据包
+cam.dump_calib_bundle()
+print('标定数据包已保存在 {}'.format(CAM_CALIB_BUNDLE))